@@ -3,20 +3,40 @@
 from cmk.agent_based.v2 import (
     AgentSection,
     CheckPlugin,
+    IgnoreResultsError,
     Service,
     Result,
     State,
     Metric,
+    check_levels,
+    render,
 )
 
+import fcntl
+import hashlib
 import json
-import itertools
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import mul
 
 def detect_device_type(fbm):
     fbm = int(fbm)
     if fbm >> 0 & 1:
         return "HANFUNDevice"
     if fbm >> 13 & 1:
+        # lights and blinds are HAN-FUN units with a device class of their own
+        if fbm >> 18 & 1:
+            return "Blind"
+        if fbm >> 2 & 1 or fbm >> 17 & 1:
+            return "Light"
         return "HANFUNUnit"
     if fbm >> 4 & 1:
         return "AlarmSensor"
@@ -34,29 +54,338 @@ def detect_device_type(fbm):
         return "TemperatureSensor"
     if fbm >> 11 & 1:
         return "Microphone"
+    if fbm >> 18 & 1:
+        return "Blind"
     if fbm >> 2 & 1 or fbm >> 17 & 1:
         return "Light"
     return "SmarthomeDevice"
 
+# functionbitmask bit -> capability, see the AHA HTTP interface documentation
+CAPABILITY_BITS = {
+    0: "hanfun",
+    2: "light",
+    4: "alarm",
+    5: "button",
+    6: "hkr",
+    7: "energy_meter",
+    8: "temperature",
+    9: "switch",
+    10: "repeater",
+    11: "microphone",
+    13: "hanfun_unit",
+    15: "on_off",
+    16: "level",
+    17: "color",
+    18: "blind",
+    20: "humidity",
+}
+
+@lru_cache(maxsize=None)
+def decode_capabilities(fbm):
+    return frozenset(name for bit, name in CAPABILITY_BITS.items() if fbm >> bit & 1)
+
+def _parse_header(line):
+    # compact format starts with {"format": "compact", "version": .., "fields": [..]}
+    if not line.startswith("{"):
+        return None
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("format") != "compact":
+        return None
+    return header
+
+@dataclass(slots=True)
+class Thermostat:
+    tist: float | None          # °C
+    tsoll: float | None         # °C, None if the valve is set to off/on (253/254)
+    summeractive: bool
+    windowopen: bool
+    battery: int | None         # %
+
+@dataclass(slots=True)
+class Humidity:
+    rel_humidity: int | None    # %
+
+@dataclass(slots=True)
+class Temperature:
+    celsius: float | None       # °C
+
+@dataclass(slots=True)
+class Switch:
+    state: int | None
+    mode: str | None
+
+@dataclass(slots=True)
+class PowerMeter:
+    power: float | None         # W
+    energy: float | None        # kWh
+    voltage: float | None       # V
+
+@dataclass(slots=True)
+class OnOff:
+    state: int | None
+
+@dataclass(slots=True)
+class LevelControl:
+    level: int | None           # 0-255
+    percentage: int | None      # %
+
+@dataclass(slots=True)
+class ColorControl:
+    hue: int | None             # °
+    saturation: int | None      # 0-255
+    temperature: int | None     # K, set in color temperature mode
+
+@dataclass(slots=True)
+class Blind:
+    mode: str | None
+    endpositionsset: bool | None
+
+@dataclass(slots=True)
+class Alert:
+    state: int | None
+    last_change: int | None     # unix timestamp
+
+@dataclass(slots=True)
+class Button:
+    name: str | None
+    last_pressed: int | None    # unix timestamp
+
+@dataclass(slots=True)
+class Device:
+    id: str
+    dev_type: str
+    manufacturer: str | None
+    productname: str | None
+    fwversion: str | None
+    functionbitmask: int
+    identifier: str | None
+    present: bool
+    name: str | None
+    battery: int | None
+    batterylow: int | None
+    capabilities: frozenset[str] = frozenset()
+    # one attribute per data block, set only if the device has the capability
+    hkr: Thermostat | None = None
+    humidity: Humidity | None = None
+    temperature: Temperature | None = None
+    switch: Switch | None = None
+    powermeter: PowerMeter | None = None
+    simpleonoff: OnOff | None = None
+    levelcontrol: LevelControl | None = None
+    colorcontrol: ColorControl | None = None
+    blind: Blind | None = None
+    alert: Alert | None = None
+    button: Button | None = None
+
+@dataclass(slots=True)
+class Group:
+    id: str
+    identifier: str | None
+    name: str | None
+    members: tuple[str, ...]    # device ids
+
+@dataclass(slots=True)
+class GroupAggregate:
+    # running values over the member devices of one group
+    members: int = 0
+    missing: int = 0
+    offline: int = 0
+    power: float | None = None          # W
+    energy: float | None = None         # kWh
+    temp_min: float | None = None       # °C
+    temp_max: float | None = None
+    temp_sum: float = 0.0
+    temp_count: int = 0
+    humidity_min: int | None = None     # %
+    humidity_max: int | None = None
+    humidity_sum: int = 0
+    humidity_count: int = 0
+    battery_min: int | None = None      # %
+    battery_device: str | None = None
+
+@dataclass(slots=True)
+class Section:
+    devices: dict[str, Device] = field(default_factory=dict)
+    groups: dict[str, Group] = field(default_factory=dict)
+    # filled on first use by the group services, see _group_aggregates()
+    aggregates: dict[str, GroupAggregate] | None = None
+    # JSON section of older agents, which send all devices unfiltered
+    legacy: bool = False
+    errors: list[str] = field(default_factory=list)
+    error: str | None = None
+    # None: all devices of the box, "device"/"group": piggybacked subset
+    layout: str | None = None
+    # set while the agent does not log in, see the lockout handling of the agent
+    blocked_until: float | None = None
+    blocked_reason: str | None = None
+    login_failures: int = 0
+    # set if the agent ran out of its time budget, the devices it had read
+    # by then are in the section
+    partial: dict | None = None
+
+def _to_int(value):
+    # all numeric fields go through here, missing or bad values become None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value, divisor=1):
+    try:
+        return float(value) / divisor
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True, slots=True)
+class Handler:
+    capability: str
+    block: str                  # data block of the agent record and Device attribute
+    parse: Callable             # block dict -> typed record
+    check: Callable             # (device, params) -> results
+
+# capability -> handler, the service shows the results in this order
+HANDLERS: dict[str, Handler] = {}
+
+def handler(capability, block, parse):
+    def register(check):
+        HANDLERS[capability] = Handler(capability, block, parse, check)
+        return check
+    return register
+
+@lru_cache(maxsize=None)
+def _handlers(fbm):
+    # resolved once per bitmask, devices only pay for their own capabilities
+    capabilities = decode_capabilities(fbm)
+    return capabilities, tuple(h for h in HANDLERS.values() if h.capability in capabilities)
+
+def _device(raw):
+    # convert and scale the raw agent record once
+    data = raw.get("data") or {}
+    fbm = _to_int(raw.get("functionbitmask")) or 0
+    capabilities, handlers = _handlers(fbm)
+    dev = Device(
+        id=raw["id"],
+        dev_type=detect_device_type(fbm),
+        manufacturer=raw.get("manufacturer"),
+        productname=raw.get("productname"),
+        fwversion=raw.get("fwversion"),
+        functionbitmask=fbm,
+        identifier=raw.get("identifier"),
+        present=raw.get("present") == "1",
+        name=raw.get("name"),
+        battery=_to_int(raw.get("battery")),
+        batterylow=_to_int(raw.get("batterylow")),
+        capabilities=capabilities,
+    )
+    for h in handlers:
+        block = data.get(h.block)
+        if block is not None:
+            setattr(dev, h.block, h.parse(block))
+    return dev
+
+def _add_device(section, raw, where):
+    try:
+        dev = _device(raw)
+    except (AttributeError, KeyError, TypeError) as e:
+        section.errors.append(f"{where}: invalid device record ({e!r})")
+        return
+    section.devices[dev.id] = dev
+
+def _add_group(section, raw, where):
+    try:
+        group = Group(id=raw["id"], identifier=raw.get("identifier"), name=raw.get("name"),
+                      members=tuple(raw.get("members") or ()))
+    except (AttributeError, KeyError, TypeError) as e:
+        section.errors.append(f"{where}: invalid group record ({e!r})")
+        return
+    section.groups[group.id] = group
+
+def _set_blocked(section, record):
+    section.blocked_until = _to_float(record.get("blocked_until"))
+    section.blocked_reason = record.get("reason")
+    section.login_failures = _to_int(record.get("failures")) or 0
+
+def _partial_message(partial):
+    return (f"Not in the partial data of the agent "
+            f"({partial.get('reason') or partial.get('stage') or 'no reason given'})")
+
+def _parse_compact(header, lines):
+    # one record per line, a broken record only loses its own device
+    fields = header.get("fields", [])
+    section = Section(layout=header.get("layout"))
+    for lineno, line in enumerate(lines, start=2):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            section.errors.append(f"line {lineno}: {e}")
+            continue
+        if isinstance(record, dict):
+            if "group" in record:
+                _add_group(section, record["group"], f"line {lineno}")
+            if "error" in record:
+                section.error = record["error"]
+            if "blocked_until" in record:
+                _set_blocked(section, record)
+            if isinstance(record.get("partial"), dict):
+                section.partial = record["partial"]
+            continue
+        if not isinstance(record, list) or len(record) != len(fields):
+            section.errors.append(f"line {lineno}: expected {len(fields)} fields")
+            continue
+        _add_device(section, dict(zip(fields, record)), f"line {lineno}")
+    return section
+
+def _parse_json(lines):
+    # legacy format: one JSON document, the agent error is a plain object
+    data = json.loads(" ".join(lines))
+    section = Section(legacy=True)
+    if isinstance(data, dict):
+        section.error = data.get("error")
+        if "blocked_until" in data:
+            _set_blocked(section, data)
+        return section
+    for index, raw in enumerate(data):
+        _add_device(section, raw, f"device #{index}")
+    return section
+
+# parsed sections by content digest: the check helpers of Checkmk keep
+# running between check cycles, so a section the agent sends again unchanged
+# (--unchanged-max-age) is only hashed, not parsed again
+PARSE_CACHE_SIZE = 8
+_parsed: dict[str, Section] = {}
+
 def parse_fritzbox_smarthome(string_table):
-    #print ("stringtable : ", string_table)
-    flat = list(itertools.chain.from_iterable(string_table))
-    data = json.loads("".join(flat))
-    return data
+    # sep(0) gives one element per line, the legacy :json section is split
+    # at whitespace and joined back with single blanks
+    lines = [" ".join(line) for line in string_table]
+    if not lines:
+        return Section()
+    digest = hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+    section = _parsed.pop(digest, None)
+    if section is None:
+        header = _parse_header(lines[0])
+        section = _parse_json(lines) if header is None else _parse_compact(header, lines[1:])
+    # most recently used last, the oldest entry is dropped
+    _parsed[digest] = section
+    if len(_parsed) > PARSE_CACHE_SIZE:
+        del _parsed[next(iter(_parsed))]
+    return section
 
 def discover_fritzbox_smarthome(section):
-    # missing access to params here: dunno how to get around this
-    for dev in section:
-        dev_type = detect_device_type(dev.get("functionbitmask", 0))
-        # hardcoded filter what is wrong
-        if dev_type == "HANFUNUnit":
+    # the agent filters devices (--hanfun-units, --include-*, --exclude-*),
+    # only the unfiltered legacy format still needs the hard filter
+    for dev in section.devices.values():
+        if section.legacy and dev.dev_type == "HANFUNUnit":
             continue
-        name = f"{dev_type} {dev['id']} {dev['name']}"
+        name = f"{dev.dev_type} {dev.id} {dev.name}"
         yield Service(item=name, parameters={})
 
-
 default_params = {
     "present": 1,
+    "alarm": "crit",
     "showHFunit": False,
     "hkr": {
         "hkr_bat_always": True,
@@ -81,49 +410,37 @@ default_params = {
     },
 }
 
-def check_fritzbox_smarthome(item, params, section):
-    params = params or default_params
+def _configured_state(value, default=State.WARN):
+    return {"ok": State.OK, "warn": State.WARN, "crit": State.CRIT}.get(str(value), default)
 
-    # Device filter
-    dev_id = item.split(" ")[1]
-    dev = next((d for d in section if d["id"] == dev_id), None)
-    if not dev:
-        yield Result(state=State.CRIT, summary="Device not found")
-        return
-
-    # make HANFUNUnit devices ignored if not chosen otherwise by config
-    dev_type = item.split(" ")[0]
-    if dev_type == "HANFUNUnit" and not params.get("sHFU_param", False):
-        # ignore HANFUNUnit unless showHANFANUnit is True
-        return
+# --- thermostat (HKR aka Heizkoerperegler) ---
+def _parse_hkr(h):
+    tsoll = _to_int(h.get("tsoll"))
+    return Thermostat(
+        tist=_to_float(h.get("tist"), 2),
+        tsoll=tsoll / 2 if tsoll is not None and tsoll not in (253, 254) else None,
+        summeractive=_to_int(h.get("summeractive")) == 1,
+        windowopen=_to_int(h.get("windowopenactiv")) == 1,
+        battery=_to_int(h.get("battery")),
+    )
 
-    # offline-handling
-    present_param = str(params.get("present", "warn"))
-    if dev.get("present") != "1":
-        state = {"ok": State.OK, "warn": State.WARN, "crit": State.CRIT}.get(present_param, State.WARN)
-        yield Result(state=state, summary="Device not present")
-        return
+@handler("hkr", "hkr", _parse_hkr)
+def _check_hkr(dev, params):
+    h = dev.hkr
 
-    # set default-OK with Vendor/Name
-    summary = f"{dev.get('manufacturer','?')} {dev.get('productname','?')} ({dev.get('name','?')})"
-    yield Result(state=State.OK, summary=summary)
+    # get warn-crit-level from ruleset
+    warn_p = params["hkr"]["hkr_warn"]
+    crit_p = params["hkr"]["hkr_crit"]
+    warn_diff = warn_p.get("hkr_diff_soll", 5.0)
+    crit_diff = crit_p.get("hkr_diff_soll", 10.0)
+    warn_bat  = warn_p.get("hkr_bat_below", 50)
+    crit_bat  = crit_p.get("hkr_bat_below", 30)
 
-    data = dev.get("data", {})
-
-    # --- thermostat (HKR aka Heizkoerperegler) ---
-    if "hkr" in data:
-        h = data["hkr"]
-
-        # get warn-crit-level from ruleset
-        warn_p = params["hkr"]["hkr_warn"]
-        crit_p = params["hkr"]["hkr_crit"]
-        warn_diff = warn_p.get("hkr_diff_soll", 5.0)
-        crit_diff = crit_p.get("hkr_diff_soll", 10.0)
-        warn_bat  = warn_p.get("hkr_bat_below", 50)
-        crit_bat  = crit_p.get("hkr_bat_below", 30)
-
-        # --- battery ---
-        battery = int(h.get("battery", 0))
+    # --- battery ---
+    battery = h.battery
+    if battery is None:
+        yield Result(state=State.WARN, summary="Battery not available")
+    else:
         # battery state
         if battery < crit_bat:
             yield Result(state=State.CRIT, summary=f"Battery critically low: {battery}%")
@@ -134,108 +451,584 @@ def check_fritzbox_smarthome(item, params, section):
         if params["hkr"].get("hkr_bat_always", False):
             yield Metric("battery", battery, boundaries=(0, 100))
 
-        # --- temperature ---
-        tist = float(h.get("tist", 0)) / 2
-
+    # --- temperature ---
+    tist = h.tist
+    if tist is None:
+        yield Result(state=State.WARN, summary="Temperature not available")
+    else:
         # temperature-metrics #1 (is-value)
         yield Metric("temp_actual", tist)
 
         yield Result(state=State.OK, summary=f"Temperature: {tist}°C")
 
-        # temperature-deviation
-        # target-value gives no numerical sense for computation/drawing during summer period
-        # during non-heating period (summer): tsoll is reported as 253 (kindof max value?)
-        #tsoll = float(h.get("tsoll", 0)) / 2 
-        tsollraw = int(h.get("tsoll", 0))
-        if int(h.get("summeractive"), 0) == 0 and tsollraw != 253:
-            tsoll = float(tsollraw) / 2.0
-            # temperature-metrics #2 (target-value)
-            yield Metric("temp_target", tsoll)
+    # temperature-deviation
+    # target-value gives no numerical sense for computation/drawing during summer period
+    # during non-heating period (summer): tsoll is reported as 253 (kindof max value?)
+    if not h.summeractive and h.tsoll is not None:
+        tsoll = h.tsoll
+        # temperature-metrics #2 (target-value)
+        yield Metric("temp_target", tsoll)
 
+        if tist is not None:
             diff = abs(tsoll - tist)
             if diff > crit_diff:
                 yield Result(state=State.CRIT, summary=f"Temperature deviation too high: {diff}K")
             elif diff > warn_diff:
                 yield Result(state=State.WARN, summary=f"Temperature deviation: {diff}K")
+    else:
+        yield Result(state=State.OK, summary=f"(Sommermodus)")
+
+    # --- windowopen ---
+    wo = int(h.windowopen)
+    yield Metric("WindowOpen", wo)
+    yield Result(state=State.OK, summary=f"Window is {'open' if wo==1 else 'closed'}")
+
+# --- humidity ---
+@handler("humidity", "humidity", lambda b: Humidity(rel_humidity=_to_int(b.get("rel_humidity"))))
+def _check_humidity(dev, params):
+    rh = dev.humidity.rel_humidity
+    if rh is None:
+        return
+    yield Metric("humidity", rh)
+
+    hwarn = params["humidity"]["humidity_warn"]
+    hcrit = params["humidity"]["humidity_crit"]
+    warn_high = hwarn.get("higher_than", 60)
+    warn_low  = hwarn.get("lower_than",  40)
+    crit_high = hcrit.get("higher_than", 70)
+    crit_low  = hcrit.get("lower_than",  30)
+
+    if rh > crit_high or rh < crit_low:
+        yield Result(state=State.CRIT, summary=f"Humidity critical: {rh}%")
+    elif rh > warn_high or rh < warn_low:
+        yield Result(state=State.WARN, summary=f"Humidity warning: {rh}%")
+    else:
+        yield Result(state=State.OK, summary=f"Humidity OK: {rh}%")
+
+# --- temperature ---
+# no warn/crit levels
+@handler("temperature", "temperature", lambda b: Temperature(celsius=_to_float(b.get("celsius"), 10)))
+def _check_temperature(dev, params):
+    te = dev.temperature.celsius
+    if te is None:
+        return
+    yield Metric("temperature", te)
+    yield Result(state=State.OK, summary=f"Temperature: {te}°C")
+
+# --- switch ---
+@handler("switch", "switch", lambda b: Switch(state=_to_int(b.get("state")), mode=b.get("mode")))
+def _check_switch(dev, params):
+    st = dev.switch.state or 0
+    mode = dev.switch.mode or "unknown"
+    yield Metric("switch_state", st)
+    yield Result(state=State.OK, summary=f"Switch is {'ON' if st==1 else 'OFF'} ({mode})")
+
+# --- powermeter ---
+def _parse_powermeter(pm):
+    return PowerMeter(
+        power=_to_float(pm.get("power"), 1000),
+        energy=_to_float(pm.get("energy"), 1000),
+        voltage=_to_float(pm.get("voltage"), 1000),
+    )
+
+@handler("energy_meter", "powermeter", _parse_powermeter)
+def _check_powermeter(dev, params):
+    pm = dev.powermeter
+    # Power
+    if pm.power is None:
+        yield Result(state=State.WARN, summary="Power not available")
+    else:
+        yield Metric("power", pm.power)
+        yield Result(state=State.OK, summary=f"Power: {pm.power:.2f}W")
+    # Energy
+    if pm.energy is None:
+        yield Result(state=State.WARN, summary="Energy not available")
+    else:
+        yield Metric("energy", pm.energy)
+        yield Result(state=State.OK, summary=f"Energy: {pm.energy:.2f}kWh")
+    # Voltage
+    if pm.voltage is None:
+        yield Result(state=State.WARN, summary="Voltage not available")
+    else:
+        yield Metric("voltage", pm.voltage)
+        yield Result(state=State.OK, summary=f"Voltage: {pm.voltage:.1f}V")
+
+# --- on/off (lights, blinds); outlets report it with their switch ---
+@handler("on_off", "simpleonoff", lambda b: OnOff(state=_to_int(b.get("state"))))
+def _check_onoff(dev, params):
+    if "switch" in dev.capabilities or dev.simpleonoff.state is None:
+        return
+    st = dev.simpleonoff.state
+    yield Metric("switch_state", st)
+    yield Result(state=State.OK, summary=f"State: {'ON' if st == 1 else 'OFF'}")
+
+# --- level (dimmer, blind position) ---
+def _parse_levelcontrol(lc):
+    return LevelControl(level=_to_int(lc.get("level")), percentage=_to_int(lc.get("levelpercentage")))
+
+@handler("level", "levelcontrol", _parse_levelcontrol)
+def _check_levelcontrol(dev, params):
+    pct = dev.levelcontrol.percentage
+    if pct is None:
+        yield Result(state=State.OK, summary="Level not available")
+        return
+    yield Metric("level", pct, boundaries=(0, 100))
+    yield Result(state=State.OK, summary=f"Level: {pct}%")
+
+# --- color ---
+def _parse_colorcontrol(cc):
+    return ColorControl(
+        hue=_to_int(cc.get("hue")),
+        saturation=_to_int(cc.get("saturation")),
+        temperature=_to_int(cc.get("temperature")),
+    )
+
+@handler("color", "colorcontrol", _parse_colorcontrol)
+def _check_colorcontrol(dev, params):
+    cc = dev.colorcontrol
+    if cc.temperature:
+        yield Metric("color_temperature", cc.temperature)
+        yield Result(state=State.OK, summary=f"Color temperature: {cc.temperature}K")
+    elif cc.hue is not None and cc.saturation is not None:
+        yield Metric("color_hue", cc.hue, boundaries=(0, 359))
+        yield Metric("color_saturation", cc.saturation * 100 / 255, boundaries=(0, 100))
+        yield Result(state=State.OK, summary=f"Color: hue {cc.hue}°, saturation {cc.saturation * 100 / 255:.0f}%")
+
+# --- blind ---
+def _parse_blind(b):
+    endpositionsset = _to_int(b.get("endpositionsset"))
+    return Blind(mode=b.get("mode"), endpositionsset=None if endpositionsset is None else endpositionsset == 1)
+
+@handler("blind", "blind", _parse_blind)
+def _check_blind(dev, params):
+    yield Result(state=State.OK, summary=f"Blind mode: {dev.blind.mode or 'unknown'}")
+    if dev.blind.endpositionsset is False:
+        yield Result(state=State.WARN, summary="End positions not set")
+
+# --- alarm (smoke detector, HAN-FUN contacts) ---
+def _parse_alert(a):
+    return Alert(state=_to_int(a.get("state")), last_change=_to_int(a.get("lastalertchgtimestamp")))
+
+@handler("alarm", "alert", _parse_alert)
+def _check_alert(dev, params):
+    alert = dev.alert
+    since = f" since {render.datetime(alert.last_change)}" if alert.last_change else ""
+    if alert.state is None:
+        yield Result(state=State.WARN, summary="Alarm state not available")
+    elif alert.state:
+        yield Result(state=_configured_state(params.get("alarm", "crit"), State.CRIT), summary=f"Alarm{since}")
+    else:
+        yield Result(state=State.OK, summary=f"No alarm{since}")
+
+# --- button ---
+def _parse_button(b):
+    return Button(name=b.get("name"), last_pressed=_to_int(b.get("lastpressedtimestamp")))
+
+@handler("button", "button", _parse_button)
+def _check_button(dev, params):
+    btn = dev.button
+    if btn.last_pressed:
+        yield Result(state=State.OK, summary=f"Last button press: {render.datetime(btn.last_pressed)}")
+    else:
+        yield Result(state=State.OK, summary="Button not pressed yet")
+
+# --- local history for the trend checks ---
+# one memory mapped file per device (by AIN) with a ring of (time, value)
+# samples per metric. Times are seconds since the file was created, which
+# keeps the sums of squares of the regression precise. Fits over a whole
+# ring use running sums and read no samples. A fit over a window (only the
+# temperature trend) sums the samples in it: five passes of sum()/map() over
+# memoryview slices, each creating a float object per sample, but no list
+# or tuple of the window.
+HISTORY_VERSION = 1
+# metric: (samples kept, seconds between two samples at least)
+HISTORY_METRICS = {
+    "temperature": (360, 0),
+    "power": (1440, 0),
+    "battery": (720, 3600),
+}
+# power readings that hardly ever change would make any change an anomaly
+POWER_DEVIATION_FLOOR = 1.0
+
+@dataclass(slots=True)
+class Fit:
+    n: int
+    span: float
+    mean: float
+    stdev: float
+    # change per second, least squares
+    slope: float | None
+
+class Ring:
+    # head, count, time of the last sample and the sums of t, v, t*t, t*v and
+    # v*v over all samples, kept up to date on append, so a fit over the
+    # whole ring reads no samples at all
+    HEADER = struct.Struct("<IId5d")
+
+    def __init__(self, buf, offset, capacity):
+        self.buf = buf
+        self.offset = offset
+        self.capacity = capacity
+        start = offset + self.HEADER.size
+        view = memoryview(buf)
+        self.times = view[start:start + 8 * capacity].cast("d")
+        self.values = view[start + 8 * capacity:start + 16 * capacity].cast("d")
+        view.release()
+
+    @classmethod
+    def size(cls, capacity):
+        return cls.HEADER.size + 16 * capacity
+
+    def append(self, t, value, min_interval=0):
+        head, count, last, st, sv, stt, stv, svv = self.HEADER.unpack_from(self.buf, self.offset)
+        if count and (t <= last or t - last < min_interval):
+            return
+        if count == self.capacity:
+            old_t, old_v = self.times[head], self.values[head]
+            st, sv = st - old_t, sv - old_v
+            stt, stv, svv = stt - old_t * old_t, stv - old_t * old_v, svv - old_v * old_v
+        self.times[head] = t
+        self.values[head] = value
+        st, sv = st + t, sv + value
+        stt, stv, svv = stt + t * t, stv + t * value, svv + value * value
+        head, count = (head + 1) % self.capacity, min(count + 1, self.capacity)
+        if head == 0:
+            # summed up anew once per round, so rounding errors do not add up
+            _n, st, sv, stt, stv, svv = self._sums([(0, count)])
+        self.HEADER.pack_into(self.buf, self.offset, head, count, t, st, sv, stt, stv, svv)
+
+    def _ranges(self, since):
+        # physical index ranges of the samples at or after since, oldest first
+        head, count = self.HEADER.unpack_from(self.buf, self.offset)[:2]
+        start = (head - count) % self.capacity
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[(start + mid) % self.capacity] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        first, n = (start + lo) % self.capacity, count - lo
+        if first + n <= self.capacity:
+            return [(first, first + n)] if n else []
+        return [(first, self.capacity), (0, first + n - self.capacity)]
+
+    def _sums(self, ranges):
+        # per sample work: the five passes each box every sample as a float,
+        # so a window costs about five times its size in short lived objects
+        n = st = sv = stt = stv = svv = 0
+        for a, b in ranges:
+            with self.times[a:b] as ts, self.values[a:b] as vs:
+                n += b - a
+                st += sum(ts)
+                sv += sum(vs)
+                stt += sum(map(mul, ts, ts))
+                stv += sum(map(mul, ts, vs))
+                svv += sum(map(mul, vs, vs))
+        return n, st, sv, stt, stv, svv
+
+    def fit(self, since=None):
+        # over all samples or the ones at or after since
+        head, count, last, *sums = self.HEADER.unpack_from(self.buf, self.offset)
+        if since is None:
+            if not count:
+                return None
+            n, (st, sv, stt, stv, svv) = count, sums
+            span = last - self.times[(head - count) % self.capacity]
         else:
-            yield Result(state=State.OK, summary=f"(Sommermodus)")
-
-        # --- windowopen ---
-        wo = int(h.get("windowopenactiv", "0"))
-        yield Metric("WindowOpen", wo)
-        yield Result(state=State.OK, summary=f"Window is {'open' if wo==1 else 'closed'}")
-            
-
-    # --- humidity ---
-    if "humidity" in data:
-        rh = int(data["humidity"].get("rel_humidity", 0))
-        yield Metric("humidity", rh)
-
-        hwarn = params["humidity"]["humidity_warn"]
-        hcrit = params["humidity"]["humidity_crit"]
-        warn_high = hwarn.get("higher_than", 60)
-        warn_low  = hwarn.get("lower_than",  40)
-        crit_high = hcrit.get("higher_than", 70)
-        crit_low  = hcrit.get("lower_than",  30)
-
-        if rh > crit_high or rh < crit_low:
-            yield Result(state=State.CRIT, summary=f"Humidity critical: {rh}%")
-        elif rh > warn_high or rh < warn_low:
-            yield Result(state=State.WARN, summary=f"Humidity warning: {rh}%")
-        else:
-            yield Result(state=State.OK, summary=f"Humidity OK: {rh}%")
+            ranges = self._ranges(since)
+            if not ranges:
+                return None
+            n, st, sv, stt, stv, svv = self._sums(ranges)
+            span = self.times[ranges[-1][1] - 1] - self.times[ranges[0][0]]
+        mean = sv / n
+        var_t = n * stt - st * st
+        return Fit(
+            n=n,
+            span=span,
+            mean=mean,
+            stdev=max(0.0, svv / n - mean * mean) ** 0.5,
+            slope=(n * stv - st * sv) / var_t if n > 1 and var_t > 0 else None,
+        )
+
+    def release(self):
+        self.times.release()
+        self.values.release()
+
+class History:
+    HEADER = struct.Struct("<4sIId")  # magic, version, layout, base time
+    MAGIC = b"FBSH"
+    LAYOUT = int.from_bytes(hashlib.sha256(repr(HISTORY_METRICS).encode()).digest()[:4], "little")
+    OFFSET = 24
+    SIZE = OFFSET + sum(Ring.size(capacity) for capacity, _ in HISTORY_METRICS.values())
+
+    def __init__(self, buf):
+        self.buf = buf
+        magic, version, layout, base = self.HEADER.unpack_from(buf, 0)
+        if (magic, version, layout) != (self.MAGIC, HISTORY_VERSION, self.LAYOUT):
+            buf[:] = bytes(self.SIZE)
+            base = time.time()
+            self.HEADER.pack_into(buf, 0, self.MAGIC, HISTORY_VERSION, self.LAYOUT, base)
+        self.base = base
+        self.rings = {}
+        offset = self.OFFSET
+        for metric, (capacity, _min_interval) in HISTORY_METRICS.items():
+            self.rings[metric] = Ring(buf, offset, capacity)
+            offset += Ring.size(capacity)
+
+    def append(self, metric, now, value):
+        self.rings[metric].append(now - self.base, value, HISTORY_METRICS[metric][1])
 
-    # --- temperatur (none-hkr devices)  ---
-    # no warn/crit levels
-    if "temperature" in data:
-        te = float(data["temperature"].get("celsius", 0)) / 10.0
-        yield Metric("temperature", te)
-        yield Result(state=State.OK, summary=f"Temperature: {te}°C")
+    def fit(self, metric, now, window=None):
+        return self.rings[metric].fit(None if window is None else now - self.base - window)
+
+    def release(self):
+        for ring in self.rings.values():
+            ring.release()
+
+def _history_dir():
+    omd_root = os.environ.get("OMD_ROOT")
+    if omd_root:
+        return os.path.join(omd_root, "var", "check_mk", "fritzbox_smarthome_history")
+    return os.path.join(tempfile.gettempdir(), f"fritzbox_smarthome_history-{os.getuid()}")
+
+@contextmanager
+def open_history(ain, directory=None):
+    # locked for the time of one check, the file is created or reset if its
+    # layout does not match
+    directory = directory or _history_dir()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_-]", "_", ain) + ".ring")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if os.fstat(fd).st_size != History.SIZE:
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, History.SIZE)
+        with mmap.mmap(fd, History.SIZE) as buf:
+            history = History(buf)
+            try:
+                yield history
+            finally:
+                history.release()
+    finally:
+        os.close(fd)
+
+def _trends(history, dev, trends, now):
+    # results are collected while the file is locked and yielded afterwards
+    results = []
+    temperature = (dev.temperature.celsius if dev.temperature is not None
+                   else dev.hkr.tist if dev.hkr is not None else None)
+    if temperature is not None:
+        history.append("temperature", now, temperature)
+        window = trends.get("temperature_window", 1800)
+        fit = history.fit("temperature", now, window)
+        # a fall rate needs samples over at least half of the window
+        if "temperature_fall" in trends and fit and fit.slope is not None and fit.span >= window / 2:
+            results += check_levels(
+                -fit.slope * 3600,
+                levels_upper=trends["temperature_fall"],
+                metric_name="temperature_fall_rate",
+                render_func=lambda v: f"{v:.2f} K/h",
+                label="Temperature falling by",
+                notice_only=True,
+            )
+
+    power = dev.powermeter.power if dev.powermeter is not None else None
+    if power is not None:
+        # compared to the history before this reading
+        fit = history.fit("power", now)
+        history.append("power", now, power)
+        if "power_deviation" in trends and fit and fit.n >= 30:
+            deviation = (power - fit.mean) / max(fit.stdev, POWER_DEVIATION_FLOOR)
+            results += check_levels(
+                abs(deviation),
+                levels_upper=trends["power_deviation"],
+                render_func=lambda v: f"{v:.1f} σ",
+                label=f"Power deviation from the average of {fit.mean:.1f}W",
+                notice_only=True,
+            )
+
+    if dev.battery is not None:
+        history.append("battery", now, dev.battery)
+        fit = history.fit("battery", now)
+        # a forecast needs a discharge over at least a day
+        if ("battery_days" in trends and fit and fit.slope is not None and fit.slope < 0
+                and fit.span >= 86400):
+            results += check_levels(
+                dev.battery / (-fit.slope * 86400),
+                levels_lower=trends["battery_days"],
+                metric_name="battery_days_left",
+                render_func=lambda v: f"{v:.0f} days",
+                label="Battery empty in",
+                notice_only=True,
+            )
+    return results
+
+def _check_trends(dev, params):
+    trends = params.get("trends")
+    if not trends or not dev.identifier:
+        return
+    if dev.battery is None and dev.temperature is None and dev.hkr is None and dev.powermeter is None:
+        return
+    try:
+        with open_history(dev.identifier) as history:
+            results = _trends(history, dev, trends, time.time())
+    except OSError as e:
+        yield Result(state=State.OK, notice=f"No trend history: {e}")
+        return
+    yield from results
+
+def check_fritzbox_smarthome(item, params, section):
+    params = params or default_params
+
+    # Device filter
+    dev_id = item.split(" ")[1]
+    dev = section.devices.get(dev_id)
+    if not dev:
+        if section.blocked_until is not None:
+            # failed logins are a configuration problem, a block by the box is transient
+            yield Result(
+                state=State.CRIT if section.login_failures else State.WARN,
+                summary=f"Login blocked until {render.datetime(section.blocked_until)}"
+                        f" ({section.blocked_reason or 'no reason given'})",
+            )
+            return
+        if section.error:
+            yield Result(state=State.UNKNOWN, summary=f"Agent error: {section.error}")
+            return
+        if section.partial is not None:
+            # keeps the last state, the device may well be there next run
+            raise IgnoreResultsError(_partial_message(section.partial))
+        summary = "Device not found"
+        if section.layout:
+            summary += f" on this host (agent sends one piggyback host per {section.layout})"
+        if section.errors:
+            summary += f" ({len(section.errors)} malformed device records in section)"
+        yield Result(state=State.CRIT, summary=summary,
+                     details="\n".join(section.errors) or None)
+        return
+
+    # offline-handling
+    if not dev.present:
+        yield Result(state=_configured_state(params.get("present", "warn")), summary="Device not present")
+        return
+
+    # set default-OK with Vendor/Name
+    summary = f"{dev.manufacturer or '?'} {dev.productname or '?'} ({dev.name or '?'})"
+    yield Result(state=State.OK, summary=summary)
+
+    for h in _handlers(dev.functionbitmask)[1]:
+        if getattr(dev, h.block) is not None:
+            yield from h.check(dev, params)
+
+    yield from _check_trends(dev, params)
 
     # --- battery + batterylow (generic) ---
-    if "battery" in dev and dev.get("battery") != None and dev.get("battery") != 'null,':
-        blvl = int(dev.get("battery"))
-        yield Metric("batteryLevel", blvl)
-    if "batterylow" in dev and dev.get("batterylow") != None:
-        bl = int(dev.get("batterylow"))
-        if bl == 0:
+    if dev.battery is not None:
+        yield Metric("batteryLevel", dev.battery)
+    if dev.batterylow is not None:
+        if dev.batterylow == 0:
             yield Result(state=State.OK, summary=f"Battery is ok")
         else:
             yield Result(state=State.WARN, summary=f"Battery is low")
 
-    # --- Switch, Powermeter etc. unchanged ---
-    if "switch" in data:
-        st = data["switch"].get("state","0")
-        mode = data["switch"].get("mode","unknown")
-        yield Metric("switch_state", int(st))
-        yield Result(state=State.OK, summary=f"Switch is {'ON' if st=='1' else 'OFF'} ({mode})")
-
-    if "powermeter" in data:
-        pm = data["powermeter"]
-        # Power
-        p = pm.get("power")
-        if p is None:
-            yield Result(state=State.WARN, summary="Power not available")
-        else:
-            power = float(p) / 1000
-            yield Metric("power", power)
-            yield Result(state=State.OK, summary=f"Power: {power:.2f}W")
-        # Energy
-        e = pm.get("energy")
-        if e is None:
-            yield Result(state=State.WARN, summary="Energy not available")
-        else:
-            energy = float(e) / 1000
-            yield Metric("energy", energy)
-            yield Result(state=State.OK, summary=f"Energy: {energy:.2f}kWh")
-        # Voltage
-        v = pm.get("voltage")
-        if v is None:
-            yield Result(state=State.WARN, summary="Voltage not available")
-        else:
-            voltage = float(v) / 1000
-            yield Metric("voltage", voltage)
-            yield Result(state=State.OK, summary=f"Voltage: {voltage:.1f}V")
+
+def _group_aggregates(section):
+    # one pass over the devices for all groups, shared by the group services
+    if section.aggregates is not None:
+        return section.aggregates
+    aggregates = {group_id: GroupAggregate() for group_id in section.groups}
+    membership = {}
+    for group in section.groups.values():
+        for member in group.members:
+            membership.setdefault(member, []).append(aggregates[group.id])
+        aggregates[group.id].missing = sum(1 for m in group.members if m not in section.devices)
+
+    for dev in section.devices.values():
+        for agg in membership.get(dev.id, ()):
+            agg.members += 1
+            if not dev.present:
+                agg.offline += 1
+                continue
+            if dev.powermeter:
+                if dev.powermeter.power is not None:
+                    agg.power = (agg.power or 0.0) + dev.powermeter.power
+                if dev.powermeter.energy is not None:
+                    agg.energy = (agg.energy or 0.0) + dev.powermeter.energy
+            temp = dev.temperature.celsius if dev.temperature else None
+            if temp is None and dev.hkr:
+                temp = dev.hkr.tist
+            if temp is not None:
+                agg.temp_min = temp if agg.temp_min is None else min(agg.temp_min, temp)
+                agg.temp_max = temp if agg.temp_max is None else max(agg.temp_max, temp)
+                agg.temp_sum += temp
+                agg.temp_count += 1
+            rh = dev.humidity.rel_humidity if dev.humidity else None
+            if rh is not None:
+                agg.humidity_min = rh if agg.humidity_min is None else min(agg.humidity_min, rh)
+                agg.humidity_max = rh if agg.humidity_max is None else max(agg.humidity_max, rh)
+                agg.humidity_sum += rh
+                agg.humidity_count += 1
+            battery = dev.battery if dev.battery is not None else (dev.hkr.battery if dev.hkr else None)
+            if battery is not None and (agg.battery_min is None or battery < agg.battery_min):
+                agg.battery_min = battery
+                agg.battery_device = dev.name or dev.id
+
+    section.aggregates = aggregates
+    return aggregates
+
+def discover_fritzbox_smarthome_group(section):
+    for group in section.groups.values():
+        yield Service(item=f"{group.id} {group.name}")
+
+def check_fritzbox_smarthome_group(item, section):
+    group_id = item.split(" ")[0]
+    if group_id not in section.groups:
+        if section.partial is not None:
+            raise IgnoreResultsError(_partial_message(section.partial))
+        if section.layout:
+            yield Result(state=State.CRIT, summary=f"Group not found on this host "
+                                                   f"(agent sends one piggyback host per {section.layout})")
+        return
+    if section.layout == "device":
+        # the members are on their own hosts, there is nothing to aggregate here
+        members = len(section.groups[group_id].members)
+        yield Result(state=State.OK, summary=f"Devices: {members} (agent sends one piggyback host per device)")
+        yield Metric("group_devices", members)
+        return
+    agg = _group_aggregates(section)[group_id]
+
+    summary = f"Devices: {agg.members}, offline: {agg.offline}"
+    if agg.missing:
+        summary += f", not in section: {agg.missing}"
+    yield Result(state=State.OK, summary=summary)
+    yield Metric("group_devices", agg.members)
+    yield Metric("group_offline", agg.offline)
+
+    if agg.power is not None:
+        yield Metric("power", agg.power)
+        yield Result(state=State.OK, summary=f"Power: {agg.power:.2f}W")
+    if agg.energy is not None:
+        yield Metric("energy", agg.energy)
+        yield Result(state=State.OK, summary=f"Energy: {agg.energy:.2f}kWh")
+    if agg.temp_count:
+        avg = agg.temp_sum / agg.temp_count
+        yield Metric("group_temp_min", agg.temp_min)
+        yield Metric("group_temp_max", agg.temp_max)
+        yield Metric("group_temp_avg", avg)
+        yield Result(state=State.OK,
+                     summary=f"Temperature: min {agg.temp_min:.1f}°C, max {agg.temp_max:.1f}°C, avg {avg:.1f}°C")
+    if agg.humidity_count:
+        avg = agg.humidity_sum / agg.humidity_count
+        yield Metric("group_humidity_min", agg.humidity_min)
+        yield Metric("group_humidity_max", agg.humidity_max)
+        yield Metric("group_humidity_avg", avg)
+        yield Result(state=State.OK,
+                     summary=f"Humidity: min {agg.humidity_min}%, max {agg.humidity_max}%, avg {avg:.0f}%")
+    if agg.battery_min is not None:
+        yield Metric("group_battery_min", agg.battery_min, boundaries=(0, 100))
+        yield Result(state=State.OK, summary=f"Lowest battery: {agg.battery_min}% ({agg.battery_device})")
 
 
 agent_section_fritzbox_smarthome = AgentSection(
@@ -251,3 +1044,11 @@ check_plugin_fritzbox_smarthome = CheckPlugin(
     check_default_parameters=default_params,
     check_ruleset_name="fritzbox_smarthome",
 )
+
+check_plugin_fritzbox_smarthome_group = CheckPlugin(
+    name="fritzbox_smarthome_group",
+    sections=["fritzbox_smarthome"],
+    service_name="Smarthome group %s",
+    discovery_function=discover_fritzbox_smarthome_group,
+    check_function=check_fritzbox_smarthome_group,
+)
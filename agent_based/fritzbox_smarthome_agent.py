@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+from cmk.agent_based.v2 import (
+    AgentSection,
+    CheckPlugin,
+    Service,
+    Result,
+    State,
+    Metric,
+    check_levels,
+    render,
+)
+
+import json
+
+# phases of one agent run as reported by the special agent, in order
+PHASES = ("login", "download", "parse", "serialize", "stats")
+
+default_params = {
+    "runtime": ("fixed", (15.0, 25.0)),
+    "partial": "warn",
+}
+
+STATES = {"ok": State.OK, "warn": State.WARN, "crit": State.CRIT}
+
+def parse_fritzbox_smarthome_agent(string_table):
+    # a single JSON record with the telemetry of the last run of this box
+    for line in string_table:
+        try:
+            return json.loads(" ".join(line))
+        except ValueError:
+            continue
+    return None
+
+def discover_fritzbox_smarthome_agent(section):
+    yield Service()
+
+def check_fritzbox_smarthome_agent(params, section):
+    yield from check_levels(
+        section["total"],
+        levels_upper=params.get("runtime"),
+        metric_name="fritzbox_agent_runtime",
+        render_func=render.timespan,
+        label="Runtime",
+    )
+
+    phases = section.get("phases", {})
+    for phase in PHASES:
+        if phase in phases:
+            yield Metric(f"fritzbox_agent_{phase}_time", phases[phase])
+    yield Result(
+        state=State.OK,
+        notice="Phases: " + ", ".join(
+            f"{phase} {render.timespan(phases[phase])}" for phase in PHASES if phase in phases),
+    )
+
+    yield Result(state=State.OK, summary=f"Devices: {section['devices']}")
+    yield Metric("fritzbox_agent_devices", section["devices"])
+    yield Result(state=State.OK, summary=f"HTTP requests: {section['requests']}")
+    yield Metric("fritzbox_agent_requests", section["requests"])
+    yield Result(state=State.OK, summary=f"Received: {render.bytes(section['response_bytes'])}")
+    yield Metric("fritzbox_agent_response_bytes", section["response_bytes"])
+
+    # devices missing from a cut off run keep their last state, so this is
+    # where running out of the --deadline budget or a failed refresh shows
+    partial = section.get("partial")
+    if partial:
+        yield Result(
+            state=STATES.get(params.get("partial", "warn"), State.WARN),
+            summary=f"Partial data ({partial.get('stage')})",
+            details=partial.get("reason"),
+        )
+
+    # the failure itself is reported by the device services
+    if not section.get("ok", True):
+        yield Result(state=State.OK, notice="Polling the Fritz!Box failed in this run")
+
+
+agent_section_fritzbox_smarthome_agent = AgentSection(
+    name="fritzbox_smarthome_agent",
+    parse_function=parse_fritzbox_smarthome_agent,
+)
+
+check_plugin_fritzbox_smarthome_agent = CheckPlugin(
+    name="fritzbox_smarthome_agent",
+    service_name="Smarthome agent",
+    discovery_function=discover_fritzbox_smarthome_agent,
+    check_function=check_fritzbox_smarthome_agent,
+    check_default_parameters=default_params,
+    check_ruleset_name="fritzbox_smarthome_agent",
+)
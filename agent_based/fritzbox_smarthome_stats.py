@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+from cmk.agent_based.v2 import (
+    AgentSection,
+    CheckPlugin,
+    Service,
+    Result,
+    State,
+    Metric,
+    get_value_store,
+)
+
+import json
+
+# series name: (label, unit, divisor of the raw getbasicdevicestats value)
+SERIES = {
+    "temperature": ("Temperature", "°C", 10),
+    "humidity": ("Humidity", "%", 1),
+    "power": ("Power", "W", 100),
+    "voltage": ("Voltage", "V", 1000),
+    "energy": ("Energy", "kWh", 1000),
+}
+
+# seconds of samples per series the check keeps and reports on, counted back
+# from the newest sample
+STATS_WINDOW = 3600
+
+def parse_fritzbox_smarthome_stats(string_table):
+    # one JSON record per device with the samples new since the last run, or
+    # the error fetching them
+    section = {}
+    for line in string_table:
+        try:
+            record = json.loads(" ".join(line))
+        except ValueError:
+            continue
+        section[record["id"]] = record
+    return section
+
+def discover_fritzbox_smarthome_stats(section):
+    for dev_id, record in section.items():
+        yield Service(item=f"{dev_id} {record['name']}")
+
+def _slope_per_hour(points):
+    # least squares over (timestamp, value)
+    n = len(points)
+    if n < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var_t:
+        return None
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    return cov / var_t * 3600
+
+def _window(stored, series, divisor):
+    # adds the samples newer than the stored ones and drops those older than
+    # the window; values are newest first, datatime is the newest timestamp
+    stored = list(stored)
+    datatime, grid = series.get("datatime"), series.get("grid")
+    if datatime and grid:
+        newest = stored[-1][0] if stored else None
+        fresh = [(datatime - i * grid, v / divisor) for i, v in enumerate(series.get("values", []))
+                 if v is not None]
+        stored.extend(point for point in reversed(fresh) if newest is None or point[0] > newest)
+    if stored:
+        start = stored[-1][0] - STATS_WINDOW
+        stored = [point for point in stored if point[0] > start]
+    return stored
+
+def check_fritzbox_smarthome_stats(item, section):
+    dev_id = item.split(" ")[0]
+    record = section.get(dev_id)
+    if record is None:
+        return
+
+    value_store = get_value_store()
+    if "error" in record:
+        yield Result(state=State.OK, summary=f"History not fetched: {record['error']}")
+
+    reported = False
+    for name, (label, unit, divisor) in SERIES.items():
+        points = _window(value_store.get(name, []), record.get("series", {}).get(name, {}), divisor)
+        value_store[name] = points
+        if not points:
+            continue
+        reported = True
+
+        values = [v for _, v in points]
+        low, high, avg = min(values), max(values), sum(values) / len(values)
+        summary = f"{label}: min {low:.1f}{unit}, max {high:.1f}{unit}, avg {avg:.1f}{unit} ({len(values)} samples)"
+        trend = _slope_per_hour(points)
+        if trend is not None:
+            summary += f", trend {trend:+.2f}{unit}/h"
+            yield Metric(f"stats_{name}_trend", trend)
+        yield Metric(f"stats_{name}_min", low)
+        yield Metric(f"stats_{name}_max", high)
+        yield Metric(f"stats_{name}_avg", avg)
+        yield Result(state=State.OK, summary=summary)
+
+    if not reported:
+        yield Result(state=State.OK, summary=f"No samples in the last {STATS_WINDOW // 60} minutes")
+
+
+agent_section_fritzbox_smarthome_stats = AgentSection(
+    name="fritzbox_smarthome_stats",
+    parse_function=parse_fritzbox_smarthome_stats,
+)
+
+check_plugin_fritzbox_smarthome_stats = CheckPlugin(
+    name="fritzbox_smarthome_stats",
+    service_name="Smarthome stats %s",
+    discovery_function=discover_fritzbox_smarthome_stats,
+    check_function=check_fritzbox_smarthome_stats,
+)
@@ -0,0 +1,4 @@
+"""Benchmarks for the special agent and the check plugin.
+
+Run from the repository root, e.g. ``python3 -m benchmarks.run``.
+"""
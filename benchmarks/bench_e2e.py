@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""End-to-end run of the special agent against simulated boxes.
+
+Starts the simulator in-process, runs the agent as a subprocess against all
+boxes (the first one as --host, the others as --box) and reports wall time,
+output size and request throughput per round. The first round logs in, later
+rounds reuse the cached SID:
+
+    python3 -m benchmarks.bench_e2e [--boxes 4] [--devices 200] [--rounds 3]
+                                    [--latency 20] [--error-rate 0.01]
+                                    [--tls --tls-delay 300] [-- AGENT ARGS]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import AGENT_PATH
+from .simulator import start_boxes
+
+
+def agent_command(servers, args, cache_dir, extra):
+    protocol = "https" if args.tls else "http"
+    host, port = servers[0].server_address[:2]
+    command = [
+        sys.executable, AGENT_PATH,
+        "--host", host, "--port", str(port), "--protocol", protocol,
+        "--username", "smarthome", "--password", "secret",
+        "--cache-dir", cache_dir,
+    ]
+    if args.tls:
+        command.append("--ignore-ssl")
+    for server in servers[1:]:
+        command += ["--box", f"{host}:{server.server_address[1]}"]
+    return command + extra
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        extra = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boxes", type=int, default=1)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--challenge", choices=["md5", "pbkdf2"], default="pbkdf2")
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency up to ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--tls-delay", type=float, default=0.0, help="delay before each TLS handshake in ms")
+    args = parser.parse_args(argv)
+
+    servers = start_boxes(
+        args.boxes, 0, "127.0.0.1", args.tls, args.tls_delay / 1000,
+        devices=args.devices, seed=args.seed, challenge=args.challenge,
+        latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+    )
+
+    print(f"boxes={args.boxes} devices={args.devices} latency={args.latency}ms "
+          f"error_rate={args.error_rate} tls={args.tls}")
+    print(f"{'round':>5} {'exit':>4} {'wall s':>8} {'output kB':>10} {'requests':>9} {'req/s':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory() as cache_dir:
+        command = agent_command(servers, args, cache_dir, extra)
+        for round_ in range(1, args.rounds + 1):
+            before = sum(server.box.counters["requests"] for server in servers)
+            start = time.perf_counter()
+            result = subprocess.run(command, capture_output=True)
+            wall = time.perf_counter() - start
+            requests = sum(server.box.counters["requests"] for server in servers) - before
+            print(f"{round_:>5} {result.returncode:>4} {wall:>8.3f} {len(result.stdout) / 1024:>10.1f} "
+                  f"{requests:>9} {requests / wall:>8.1f}")
+            if result.returncode:
+                failed = True
+                sys.stderr.write(result.stderr.decode("utf-8", "replace"))
+
+    for server in servers:
+        print(f"port {server.server_address[1]}: {server.box.counters}")
+        server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Cost of the trend history of the check plugin.
+
+Runs check_fritzbox_smarthome() for all devices of a synthetic section
+without and with the trends, on full rings, and compares the history store
+with keeping the same samples as JSON lists per device (read, append, fit
+in Python, write), as a value store would:
+
+    python3 -m benchmarks.bench_history [--devices 1000] [--cycles 5]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from .common import FakeClient, load_agent, load_plugin
+from .generator import payload
+
+# the prefilled levels of the "Trends" rule, the check has none by default
+TRENDS = {
+    "battery_days": ("fixed", (30.0, 7.0)),
+    "temperature_fall": ("fixed", (2.0, 4.0)),
+    "temperature_window": 1800,
+    "power_deviation": ("fixed", (4.0, 6.0)),
+}
+
+
+def section_of(agent, plugin, count):
+    args = SimpleNamespace(section_format="compact", debug=False)
+    lines = agent.section_lines(agent.fetch_device_info(FakeClient(payload(count, 0)), "sid", False), args)
+    return plugin.parse_fritzbox_smarthome([[line] for line in lines[1:]])
+
+
+def fill(plugin, section):
+    # full rings, so the fits run over as many samples as in operation
+    start = time.time() - 86400 * 30
+    for dev in section.devices.values():
+        if not dev.identifier:
+            continue
+        with plugin.open_history(dev.identifier) as history:
+            for metric, (capacity, min_interval) in plugin.HISTORY_METRICS.items():
+                step = max(min_interval, 60)
+                for i in range(capacity):
+                    history.append(metric, start + i * step, 20.0 + i % 7)
+
+
+def json_store(directory, dev, now, capacities):
+    # the same samples as [[t, v], ...] per metric in one JSON file per device
+    path = os.path.join(directory, f"{dev.id}.json")
+    try:
+        with open(path) as f:
+            store = json.load(f)
+    except OSError:
+        store = {metric: [[now - 60 * i, 20.0 + i % 7] for i in range(capacity)][::-1]
+                 for metric, capacity in capacities.items()}
+    for metric, samples in store.items():
+        samples.append([now, 21.0])
+        del samples[:-capacities[metric]]
+        n = len(samples)
+        mean_t = sum(t for t, _ in samples) / n
+        mean_v = sum(v for _, v in samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+        _slope = sum((t - mean_t) * (v - mean_v) for t, v in samples) / var_t if var_t else None
+    with open(path, "w") as f:
+        f.write(json.dumps(store))
+
+
+def timed(function, cycles):
+    start = time.perf_counter()
+    for _ in range(cycles):
+        function()
+    return (time.perf_counter() - start) / cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        # the history goes below OMD_ROOT, as on a site
+        os.environ["OMD_ROOT"] = root
+        agent, plugin = load_agent(), load_plugin()
+        section = section_of(agent, plugin, args.devices)
+        items = [service.item for service in plugin.discover_fritzbox_smarthome(section)]
+        tracked = [dev for dev in section.devices.values() if dev.identifier and (
+            dev.battery is not None or dev.temperature or dev.hkr or dev.powermeter)]
+        fill(plugin, section)
+
+        def check(params):
+            def run():
+                for item in items:
+                    for _ in plugin.check_fritzbox_smarthome(item, params, section):
+                        pass
+            return run
+
+        plain = timed(check(plugin.default_params), args.cycles)
+        trends = timed(check({**plugin.default_params, "trends": TRENDS}), args.cycles)
+        json_dir = os.path.join(root, "json")
+        os.makedirs(json_dir)
+        capacities = {metric: capacity for metric, (capacity, _) in plugin.HISTORY_METRICS.items()}
+        baseline = timed(lambda: [json_store(json_dir, dev, time.time(), capacities) for dev in tracked],
+                         args.cycles)
+
+    per_device = 1e6 / max(1, len(tracked))
+    print(f"{len(items)} devices, {len(tracked)} with a history, {args.cycles} cycles")
+    print(f"{'':22} {'ms/cycle':>9} {'us/device':>10}")
+    print(f"{'check without trends':22} {1000 * plain:>9.1f}")
+    print(f"{'check with trends':22} {1000 * trends:>9.1f} {(trends - plain) * per_device:>10.1f}")
+    print(f"{'JSON lists instead':22} {1000 * baseline:>9.1f} {baseline * per_device:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
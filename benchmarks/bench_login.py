@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Compare cold and warm PBKDF2 login cost of the special agent.
+
+Cold means the stage-one key has to be derived from the password, warm means
+it is read from the key cache and only the per-challenge second stage runs.
+
+    python3 -m benchmarks.bench_login [--iter1 10000] [--iter2 2000] [--rounds 20]
+"""
+
+import argparse
+import os
+import secrets
+import tempfile
+import time
+
+from .common import load_agent
+
+
+def challenge_response(agent, challenge, password, cache_path):
+    iter1, salt1, _, _ = agent.parse_pbkdf2_challenge(challenge)
+    key = agent.stage_one_key(password, iter1, salt1, cache_path)
+    return agent.pbkdf2_response(challenge, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iter1", type=int, default=10000)
+    parser.add_argument("--iter2", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    agent = load_agent()
+    password = "secret"
+    salt1 = secrets.token_hex(16)
+
+    def challenge():
+        return f"2${args.iter1}${salt1}${args.iter2}${secrets.token_hex(16)}"
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold, warm = [], []
+        for i in range(args.rounds):
+            cache_path = os.path.join(cache_dir, f"pbkdf2-{i}.json")
+            start = time.perf_counter()
+            challenge_response(agent, challenge(), password, cache_path)
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            challenge_response(agent, challenge(), password, cache_path)
+            warm.append(time.perf_counter() - start)
+
+    cold_ms = 1000 * sum(cold) / len(cold)
+    warm_ms = 1000 * sum(warm) / len(warm)
+    print(f"iter1={args.iter1} iter2={args.iter2} rounds={args.rounds}")
+    print(f"cold login response: {cold_ms:8.2f} ms")
+    print(f"warm login response: {warm_ms:8.2f} ms")
+    print(f"speedup:             {cold_ms / warm_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Parse time and peak RSS of the device list parser against device count.
+
+Every device count runs in a fresh interpreter, so the reported peak RSS
+belongs to that parse alone. The streaming parser of the agent is compared
+with building the whole tree via ET.fromstring as the agent did before.
+
+    python3 -m benchmarks.bench_parse [--counts 10,100,1000,10000]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from .common import ROOT, chunked, load_agent
+from .generator import payload
+
+
+def tree_parse(agent, data):
+    root = ET.fromstring(data)
+    return agent.serialize_devices((agent.device_record(d) for d in root.findall("device")), False)
+
+
+def stream_parse(agent, data):
+    return agent.serialize_devices(agent.iter_devices(chunked(data, agent.CHUNK_SIZE)), False)
+
+
+def worker(mode, count):
+    agent = load_agent()
+    data = payload(count)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "tree":
+        tree_parse(agent, data)
+    else:
+        stream_parse(agent, data)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "payload_kib": len(data) // 1024,
+        "seconds": elapsed,
+        "rss_growth_kib": peak - baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="10,100,1000,10000")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "COUNT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], int(args.worker[1]))
+        return
+
+    print(f"{'devices':>8} {'payload':>10} {'mode':>7} {'parse':>10} {'RSS growth':>12}")
+    for count in (int(c) for c in args.counts.split(",")):
+        for mode in ("tree", "stream"):
+            out = subprocess.run([sys.executable, "-m", __spec__.name, "--worker", mode, str(count)],
+                                 check=True, capture_output=True, text=True, cwd=ROOT).stdout
+            result = json.loads(out)
+            print(f"{count:>8} {result['payload_kib']:>7} KiB {mode:>7} "
+                  f"{1000 * result['seconds']:>7.1f} ms {result['rss_growth_kib']:>8} KiB")
+
+
+if __name__ == "__main__":
+    main()
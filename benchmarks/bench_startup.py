@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Startup cost of the special agent.
+
+Reports the import time of the agent (python -X importtime, the slowest top
+level imports first) and, against a simulated box, the median time from
+starting the agent process to the first byte and to the end of its output
+per transport, next to the start of a bare interpreter. The SID is cached
+by a warm-up run, so a run makes three requests:
+
+    python3 -m benchmarks.bench_startup [--runs 10] [--devices 20]
+                                        [--transports stdlib,requests] [--top 10]
+"""
+
+import argparse
+import importlib.util
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import AGENT_PATH
+from .simulator import start_boxes
+
+
+def import_times(command):
+    # (cumulative us, module) of the top level imports, nested ones are indented
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command,
+                            capture_output=True, text=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        if not name[1:].startswith(" "):
+            times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+
+def timed_run(command):
+    # seconds until the first byte and until the end of the output
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdout.read(1)
+    first = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first, time.perf_counter() - start, process.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--transports", default="stdlib,requests")
+    parser.add_argument("--top", type=int, default=10, help="number of imports listed")
+    args = parser.parse_args()
+
+    # the agent parses its arguments after all module level imports
+    times = import_times([AGENT_PATH, "--help"])
+    print(f"imports of the agent: {sum(us for us, _ in times) / 1000:.1f} ms")
+    for us, name in times[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    if importlib.util.find_spec("requests") is not None:
+        requests_us = sum(us for us, _ in import_times(["-c", "import requests"]))
+        print(f"import requests (incl. interpreter start): {requests_us / 1000:.1f} ms")
+
+    servers = start_boxes(1, devices=args.devices)
+    host, port = servers[0].server_address[:2]
+    print(f"\n{'':10} {'first byte ms':>14} {'total ms':>9}  ({args.runs} runs, median)")
+    bare = [timed_run([sys.executable, "-c", "print()"]) for _ in range(args.runs)]
+    print(f"{'python':10} {1000 * statistics.median(r[0] for r in bare):>14.1f} "
+          f"{1000 * statistics.median(r[1] for r in bare):>9.1f}")
+    try:
+        for transport in args.transports.split(","):
+            if transport == "requests" and importlib.util.find_spec("requests") is None:
+                print(f"{transport:10} not installed")
+                continue
+            with tempfile.TemporaryDirectory() as cache_dir:
+                command = [
+                    sys.executable, AGENT_PATH, "--host", host, "--port", str(port),
+                    "--protocol", "http", "--username", "smarthome", "--password", "secret",
+                    "--cache-dir", cache_dir, "--transport", transport,
+                ]
+                timed_run(command)
+                runs = [timed_run(command) for _ in range(args.runs)]
+            failed = sum(1 for run in runs if run[2])
+            print(f"{transport:10} {1000 * statistics.median(r[0] for r in runs):>14.1f} "
+                  f"{1000 * statistics.median(r[1] for r in runs):>9.1f}"
+                  + (f"  {failed} failed" if failed else ""))
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
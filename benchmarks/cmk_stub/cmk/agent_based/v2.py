@@ -0,0 +1,88 @@
+"""Minimal stand-in for cmk.agent_based.v2, enough to run the plugins outside a site."""
+
+import enum
+from typing import Any, NamedTuple
+
+
+class State(enum.IntEnum):
+    OK = 0
+    WARN = 1
+    CRIT = 2
+    UNKNOWN = 3
+
+
+class Result(NamedTuple):
+    state: State
+    summary: str | None = None
+    notice: str | None = None
+    details: str | None = None
+
+
+class Metric(NamedTuple):
+    name: str
+    value: float
+    levels: Any = None
+    boundaries: Any = None
+
+
+class IgnoreResultsError(RuntimeError):
+    pass
+
+
+class Service(NamedTuple):
+    item: str | None = None
+    parameters: Any = None
+    labels: Any = None
+
+
+class _Plugin:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class AgentSection(_Plugin):
+    pass
+
+
+class CheckPlugin(_Plugin):
+    pass
+
+
+# one store for all services; a site keeps one per host and service, callers
+# checking several items clear it in between
+value_store: dict[str, Any] = {}
+
+
+def get_value_store():
+    return value_store
+
+
+def check_levels(value, *, levels_upper=None, levels_lower=None, metric_name=None,
+                 render_func=None, label=None, boundaries=None, notice_only=False):
+    state = State.OK
+    if levels_upper and levels_upper[0] == "fixed":
+        warn, crit = levels_upper[1]
+        state = State.CRIT if value >= crit else State.WARN if value >= warn else State.OK
+    if levels_lower and levels_lower[0] == "fixed":
+        warn, crit = levels_lower[1]
+        state = max(state, State.CRIT if value < crit else State.WARN if value < warn else State.OK)
+    text = (render_func or str)(value)
+    if label:
+        text = f"{label}: {text}"
+    yield Result(state=state, notice=text) if notice_only else Result(state=state, summary=text)
+    if metric_name:
+        yield Metric(metric_name, value)
+
+
+class render:
+    @staticmethod
+    def datetime(epoch):
+        return f"{epoch:.0f}"
+
+    @staticmethod
+    def timespan(seconds):
+        return f"{seconds:.2f} s"
+
+    @staticmethod
+    def bytes(value):
+        return f"{value} B"
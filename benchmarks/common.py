@@ -0,0 +1,70 @@
+"""Helpers shared by the benchmark scripts."""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+AGENT_PATH = os.path.join(ROOT, "libexec", "agent_fritzbox_smarthome")
+CMK_STUB = os.path.join(os.path.dirname(__file__), "cmk_stub")
+
+
+def load_agent():
+    # the agent is a script without .py suffix, so it is loaded by path
+    loader = importlib.machinery.SourceFileLoader("agent_fritzbox_smarthome", AGENT_PATH)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def load_plugin(name="fritzbox_smarthome"):
+    # outside a Checkmk site the minimal cmk.agent_based.v2 stub is used
+    try:
+        import cmk.agent_based.v2  # noqa: F401
+    except ImportError:
+        sys.path.insert(0, CMK_STUB)
+    path = os.path.join(ROOT, "agent_based", f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def chunked(data, size):
+    for pos in range(0, len(data), size):
+        yield data[pos:pos + size]
+
+
+class FakeResponse:
+    # just enough of requests.Response for fetch_device_info()
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return chunked(self.data, chunk_size)
+
+
+class FakeClient:
+    base_url = "http://fritz.box:80"
+
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, path, params=None, stream=False, retry=True):
+        return FakeResponse(self.data)
+
+    def iter_content(self, r, chunk_size):
+        return r.iter_content(chunk_size=chunk_size)
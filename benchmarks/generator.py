@@ -0,0 +1,135 @@
+"""Seeded generator for synthetic getdevicelistinfos payloads.
+
+The device mix follows a typical installation: radiator thermostats, outlets
+with power meter, humidity sensors, HAN-FUN devices with their units, plus
+groups over the devices.
+"""
+
+import random
+
+HKR = (
+    '<device identifier="09995 {ain:07d}" id="{id}" functionbitmask="320" fwversion="05.08" '
+    'manufacturer="AVM" productname="FRITZ!DECT 301"><present>{present}</present><txbusy>0</txbusy>'
+    '<name>{name}</name><battery>{battery}</battery><batterylow>{batterylow}</batterylow>'
+    '<temperature><celsius>{celsius}</celsius><offset>0</offset></temperature>'
+    '<hkr><tist>{tist}</tist><tsoll>{tsoll}</tsoll><absenk>32</absenk><komfort>42</komfort>'
+    '<lock>0</lock><devicelock>0</devicelock><errorcode>0</errorcode>'
+    '<windowopenactiv>{window}</windowopenactiv><windowopenactiveendtime>0</windowopenactiveendtime>'
+    '<boostactive>0</boostactive><boostactiveendtime>0</boostactiveendtime>'
+    '<batterylow>{batterylow}</batterylow><battery>{battery}</battery>'
+    '<nextchange><endperiod>1700000000</endperiod><tchange>32</tchange></nextchange>'
+    '<summeractive>{summer}</summeractive><holidayactive>0</holidayactive></hkr></device>'
+)
+
+OUTLET = (
+    '<device identifier="11657 {ain:07d}" id="{id}" functionbitmask="35712" fwversion="04.25" '
+    'manufacturer="AVM" productname="FRITZ!DECT 200"><present>{present}</present><txbusy>0</txbusy>'
+    '<name>{name}</name><switch><state>{state}</state><mode>auto</mode><lock>0</lock>'
+    '<devicelock>0</devicelock></switch><simpleonoff><state>{state}</state></simpleonoff>'
+    '<powermeter><voltage>{voltage}</voltage><power>{power}</power><energy>{energy}</energy>'
+    '</powermeter><temperature><celsius>{celsius}</celsius><offset>0</offset></temperature></device>'
+)
+
+HUMIDITY = (
+    '<device identifier="13096 {ain:07d}" id="{id}" functionbitmask="1048864" fwversion="05.10" '
+    'manufacturer="AVM" productname="FRITZ!DECT 440"><present>{present}</present><txbusy>0</txbusy>'
+    '<name>{name}</name><battery>{battery}</battery><batterylow>{batterylow}</batterylow>'
+    '<temperature><celsius>{celsius}</celsius><offset>0</offset></temperature>'
+    '<button identifier="13096 {ain:07d}-1" id="{id}1"><name>{name}: Oben rechts</name>'
+    '<lastpressedtimestamp>1700000000</lastpressedtimestamp></button>'
+    '<humidity><rel_humidity>{humidity}</rel_humidity></humidity></device>'
+)
+
+HANFUN_DEVICE = (
+    '<device identifier="11934 {ain:07d}" id="{id}" functionbitmask="1" fwversion="0.0" '
+    'manufacturer="0x0feb" productname="HAN-FUN"><present>{present}</present><txbusy>0</txbusy>'
+    '<name>{name}</name></device>'
+)
+
+HANFUN_UNIT = (
+    '<device identifier="11934 {ain:07d}-1" id="{unit_id}" functionbitmask="8208" fwversion="0.0" '
+    'manufacturer="0x0feb" productname="HAN-FUN"><present>{present}</present><txbusy>0</txbusy>'
+    '<name>{name}</name><etsiunitinfo><etsideviceid>{id}</etsideviceid><unittype>514</unittype>'
+    '<interfaces>256</interfaces></etsiunitinfo><alert><state>{alert}</state>'
+    '<lastalertchgtimestamp>1700000000</lastalertchgtimestamp></alert></device>'
+)
+
+HANFUN = HANFUN_DEVICE + HANFUN_UNIT
+
+GROUP = (
+    '<group synchronized="1" identifier="grp{ain:06X}" id="{id}" functionbitmask="4160" '
+    'fwversion="1.0" manufacturer="AVM" productname=""><present>1</present><txbusy>0</txbusy>'
+    '<name>{name}</name><hkr><tist>{tist}</tist><tsoll>{tsoll}</tsoll></hkr>'
+    '<groupinfo><masterdeviceid>0</masterdeviceid><members>{members}</members></groupinfo></group>'
+)
+
+# profile, weight; HAN-FUN entries produce a device and its unit
+PROFILES = (("hkr", 40), ("outlet", 30), ("humidity", 20), ("hanfun", 10))
+GROUP_SIZE = 8
+
+
+def _fields(rng, profile, index):
+    battery = rng.randint(5, 100)
+    return {
+        "id": 16 + 2 * index,
+        "unit_id": 17 + 2 * index,
+        "ain": index,
+        "name": f"{profile} {index}",
+        "present": int(rng.random() > 0.05),
+        "battery": battery,
+        "batterylow": int(battery < 20),
+        "celsius": rng.randint(150, 260),
+        "tist": rng.randint(32, 50),
+        "tsoll": rng.choice((34, 40, 42, 44, 253)),
+        "window": int(rng.random() < 0.05),
+        "summer": int(rng.random() < 0.1),
+        "state": rng.randint(0, 1),
+        "voltage": rng.randint(225000, 235000),
+        "power": rng.randint(0, 250000),
+        "energy": rng.randint(0, 5000000),
+        "humidity": rng.randint(25, 80),
+        "alert": int(rng.random() < 0.02),
+    }
+
+
+def generate_devices(count, seed=0):
+    """Return the (profile, fields) of ``count`` device entries."""
+    rng = random.Random(seed)
+    names, weights = zip(*PROFILES)
+    devices = []
+    for index in range(count):
+        profile = rng.choices(names, weights)[0]
+        devices.append((profile, _fields(rng, profile, index)))
+    return devices
+
+
+def iter_payload(count, seed=0, devices=None):
+    """Yield the XML of ``count`` device entries and their groups in chunks."""
+    templates = {"hkr": HKR, "outlet": OUTLET, "humidity": HUMIDITY, "hanfun": HANFUN}
+    if devices is None:
+        devices = generate_devices(count, seed)
+    yield '<devicelist version="1" fwversion="7.57">'
+    for profile, fields in devices:
+        yield templates[profile].format(**fields)
+    ids = [fields["id"] for _, fields in devices]
+    for group, start in enumerate(range(0, len(ids), GROUP_SIZE)):
+        members = ",".join(str(dev_id) for dev_id in ids[start:start + GROUP_SIZE])
+        yield GROUP.format(id=900 + group, ain=group, name=f"Room {group}", tist=42, tsoll=42,
+                           members=members)
+    yield "</devicelist>"
+
+
+def payload(count, seed=0, devices=None):
+    return "".join(iter_payload(count, seed, devices)).encode("utf-8")
+
+
+def device_infos(profile, fields):
+    """Return the getdeviceinfos XML of a device, "unit" for a HAN-FUN unit."""
+    templates = {"hkr": HKR, "outlet": OUTLET, "humidity": HUMIDITY, "hanfun": HANFUN_DEVICE,
+                 "unit": HANFUN_UNIT}
+    return templates[profile].format(**fields)
+
+
+def identifier(profile, fields):
+    prefix = {"hkr": "09995", "outlet": "11657", "humidity": "13096", "hanfun": "11934"}[profile]
+    return f"{prefix} {fields['ain']:07d}"
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Scaling benchmark of the agent and check plugin pipeline.
+
+Times each stage against the device count of a synthetic device list and
+reports throughput and peak memory (tracemalloc):
+
+    fetch     fetch_device_info() incl. serialization of the section
+    parse     parse_fritzbox_smarthome()
+    discover  discover_fritzbox_smarthome()
+    check     check_fritzbox_smarthome() for every discovered item
+
+    python3 -m benchmarks.run [--counts 10,100,1000,10000,100000] [--output FILE]
+                              [--compare BASELINE] [--threshold 1.2]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from .common import ROOT, FakeClient, load_agent, load_plugin
+from .generator import payload
+
+STAGES = ("fetch", "parse", "discover", "check")
+
+
+def pipeline(agent, plugin, data):
+    # the stages as closures, each one consuming the result of the previous
+    args = SimpleNamespace(section_format="compact", debug=False)
+    state = {}
+
+    def fetch():
+        lines = agent.section_lines(agent.fetch_device_info(FakeClient(data), "sid", False), args)
+        state["string_table"] = [[line] for line in lines[1:]]
+
+    def parse():
+        # the plugin keeps parsed sections by content, every pass has to parse
+        plugin._parsed.clear()
+        state["section"] = plugin.parse_fritzbox_smarthome(state["string_table"])
+
+    def discover():
+        state["items"] = [service.item for service in plugin.discover_fritzbox_smarthome(state["section"])]
+
+    def check():
+        section, params = state["section"], plugin.default_params
+        for item in state["items"]:
+            for _ in plugin.check_fritzbox_smarthome(item, params, section):
+                pass
+
+    return {"fetch": fetch, "parse": parse, "discover": discover, "check": check}
+
+
+def measure(agent, plugin, count, seed, memory):
+    data = payload(count, seed)
+    results = []
+    timed = pipeline(agent, plugin, data)
+    for stage in STAGES:
+        start = time.perf_counter()
+        timed[stage]()
+        seconds = time.perf_counter() - start
+        results.append({
+            "devices": count,
+            "stage": stage,
+            "payload_bytes": len(data),
+            "seconds": seconds,
+            "devices_per_second": count / seconds if seconds else None,
+        })
+
+    if memory:
+        # a second pass, tracemalloc distorts the timings
+        traced = pipeline(agent, plugin, data)
+        for result, stage in zip(results, STAGES):
+            tracemalloc.start()
+            traced[stage]()
+            result["peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {(r["devices"], r["stage"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get((result["devices"], result["stage"]))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{result['devices']:>8} {result['stage']:>9} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="10,100,1000,10000,100000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier result file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="slowdown factor reported as regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    agent, plugin = load_agent(), load_plugin()
+    results = []
+    print(f"{'devices':>8} {'stage':>9} {'time':>10} {'devices/s':>12} {'peak':>10}")
+    for count in (int(c) for c in args.counts.split(",")):
+        for result in measure(agent, plugin, count, args.seed, not args.no_memory):
+            results.append(result)
+            peak = f"{result['peak_kib']} KiB" if "peak_kib" in result else "-"
+            print(f"{count:>8} {result['stage']:>9} {1000 * result['seconds']:>7.1f} ms "
+                  f"{result['devices_per_second'] or 0:>12.0f} {peak:>10}")
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
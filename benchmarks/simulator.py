@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Local stand-in for the AHA interface of a Fritz!Box.
+
+Implements login_sid.lua with MD5 and PBKDF2 challenges, BlockTime after
+failed logins and SID expiry, and the homeautoswitch.lua commands the
+special agent uses. Device lists come from the seeded generator. Latency,
+error rate, a slow TLS handshake and a limited transfer rate can be
+injected, and several boxes can be served at once on consecutive ports:
+
+    python3 -m benchmarks.simulator --devices 200 --boxes 4 --port 18080 \\
+        --latency 20 --error-rate 0.01 [--tls --tls-delay 300] [--rate 50]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import re
+import secrets
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .generator import GROUP_SIZE, device_infos, generate_devices, identifier, payload
+
+INVALID_SID = "0000000000000000"
+# bodies are written in pieces of this size if the transfer rate is limited
+RATE_CHUNK = 4096
+
+
+class SimulatedBox:
+    """State of one simulated Fritz!Box."""
+
+    def __init__(self, devices=100, seed=0, username="smarthome", password="secret",
+                 challenge="pbkdf2", sid_ttl=1200, latency=0.0, jitter=0.0, error_rate=0.0,
+                 stats_grid=900, rate=0):
+        self.username = username
+        self.password = password
+        self.challenge_type = challenge
+        self.sid_ttl = sid_ttl
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats_grid = stats_grid
+        # bytes per second of response bodies, 0 for no limit
+        self.rate = rate
+        self.devices = generate_devices(devices, seed)
+        # per AIN commands also work on HAN-FUN units and groups
+        self.by_ain = {}
+        for profile, fields in self.devices:
+            self.by_ain[identifier(profile, fields)] = (profile, fields)
+            if profile == "hanfun":
+                self.by_ain[identifier(profile, fields) + "-1"] = ("unit", fields)
+        for group in range((len(self.devices) + GROUP_SIZE - 1) // GROUP_SIZE):
+            self.by_ain[f"grp{group:06X}"] = ("group", {"present": 1, "tsoll": 42})
+        self.device_list = payload(devices, seed, self.devices)
+        self.salt1 = secrets.token_hex(16)
+        self.iter1, self.iter2 = 10000, 2000
+        self.sessions = {}
+        self.challenges = {}
+        self.blocktime = 0
+        self.blocked_until = 0.0
+        self.counters = {"logins": 0, "failed_logins": 0, "requests": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    # --- login_sid.lua ---
+
+    def new_challenge(self, version):
+        if version == "2" and self.challenge_type == "pbkdf2":
+            challenge = f"2${self.iter1}${self.salt1}${self.iter2}${secrets.token_hex(16)}"
+        else:
+            challenge = secrets.token_hex(4)
+        with self.lock:
+            self.challenges[self.challenge_key(challenge)] = challenge
+        return challenge
+
+    @staticmethod
+    def challenge_key(challenge):
+        # responses start with salt2 (PBKDF2) or the challenge itself (MD5)
+        return challenge.rsplit("$", 1)[-1]
+
+    def expected_response(self, challenge):
+        if challenge.startswith("2$"):
+            _, iter1, salt1, iter2, salt2 = challenge.split("$")
+            hash1 = hashlib.pbkdf2_hmac("sha256", self.password.encode("utf-8"), bytes.fromhex(salt1), int(iter1))
+            hash2 = hashlib.pbkdf2_hmac("sha256", hash1, bytes.fromhex(salt2), int(iter2))
+            return f"{salt2}${hash2.hex()}"
+        return challenge + "-" + hashlib.md5((challenge + "-" + self.password).encode("utf-16le")).hexdigest()
+
+    def login(self, params):
+        now = time.time()
+        blocktime = max(0, int(self.blocked_until - now))
+        sid = INVALID_SID
+        username, response = params.get("username"), params.get("response")
+        if params.get("sid") and self.valid_sid(params["sid"]):
+            sid = params["sid"]
+        elif response is not None and not blocktime:
+            with self.lock:
+                challenge = self.challenges.pop(re.split(r"[$-]", response, 1)[0], None)
+            if (username == self.username and challenge is not None
+                    and secrets.compare_digest(self.expected_response(challenge), response)):
+                sid = secrets.token_hex(8)
+                with self.lock:
+                    self.sessions[sid] = now
+                    self.blocktime = 0
+                    self.counters["logins"] += 1
+            else:
+                # the box doubles the block time with every failed login
+                with self.lock:
+                    self.blocktime = min(max(1, 2 * self.blocktime), 3600)
+                    self.blocked_until = now + self.blocktime
+                    self.counters["failed_logins"] += 1
+                blocktime = self.blocktime
+        challenge = self.new_challenge(params.get("version"))
+        return (200, "text/xml",
+                f"<?xml version=\"1.0\" encoding=\"utf-8\"?><SessionInfo><SID>{sid}</SID>"
+                f"<Challenge>{challenge}</Challenge><BlockTime>{blocktime}</BlockTime>"
+                f"<Rights></Rights><Users><User last=\"1\">{self.username}</User></Users></SessionInfo>")
+
+    def valid_sid(self, sid):
+        now = time.time()
+        with self.lock:
+            last_used = self.sessions.get(sid)
+            if last_used is None or now - last_used > self.sid_ttl:
+                self.sessions.pop(sid, None)
+                return False
+            self.sessions[sid] = now
+            return True
+
+    # --- homeautoswitch.lua ---
+
+    def switchcmd(self, params):
+        if not self.valid_sid(params.get("sid", "")):
+            return 403, "text/plain", "403 Forbidden"
+        cmd = params.get("switchcmd")
+        if cmd == "getdevicelistinfos":
+            return 200, "text/xml", self.device_list
+        device = self.by_ain.get(params.get("ain", "").replace("+", " "))
+        if device is None:
+            return 400, "text/plain", "400 Bad Request"
+        profile, fields = device
+        if cmd == "getbasicdevicestats":
+            return 200, "text/xml", self.device_stats(profile, fields)
+        if cmd == "getdeviceinfos" and profile != "group":
+            return 200, "text/xml", device_infos(profile, fields)
+        supported = {
+            "getswitchpresent": ("present", None),
+            "getswitchstate": ("state", ("outlet",)),
+            "getswitchpower": ("power", ("outlet",)),
+            "getswitchenergy": ("energy", ("outlet",)),
+            "gettemperature": ("celsius", ("hkr", "outlet", "humidity")),
+            "gethkrtsoll": ("tsoll", ("hkr", "group")),
+        }
+        if cmd not in supported:
+            return 400, "text/plain", "400 Bad Request"
+        field, profiles = supported[cmd]
+        value = fields[field] if profiles is None or profile in profiles else "inval"
+        return 200, "text/plain", f"{value}\n"
+
+    def device_stats(self, profile, fields):
+        # the newest sample is aligned to the grid, values newest first
+        if profile not in ("hkr", "outlet", "humidity"):
+            return "<devicestats></devicestats>"
+        datatime = int(time.time()) // self.stats_grid * self.stats_grid
+        temperature = ",".join(str(fields["celsius"] + (i % 5) - 2) for i in range(96))
+        blocks = [f'<temperature><stats count="96" grid="{self.stats_grid}" datatime="{datatime}">'
+                  f"{temperature}</stats></temperature>"]
+        if profile == "humidity":
+            humidity = ",".join(str(fields["humidity"]) for _ in range(96))
+            blocks.append(f'<humidity><stats count="96" grid="{self.stats_grid}" datatime="{datatime}">'
+                          f"{humidity}</stats></humidity>")
+        if profile == "outlet":
+            power = ",".join(str(fields["power"] // 10) for _ in range(360))
+            blocks.append(f'<power><stats count="360" grid="10" datatime="{datatime}">{power}</stats></power>')
+        return "<devicestats>" + "".join(blocks) + "</devicestats>"
+
+    # --- dispatch ---
+
+    def handle(self, path, params):
+        with self.lock:
+            self.counters["requests"] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            with self.lock:
+                self.counters["errors"] += 1
+            return 500, "text/plain", "500 Internal Server Error"
+        if path == "/login_sid.lua":
+            return self.login(params)
+        if path == "/webservices/homeautoswitch.lua":
+            return self.switchcmd(params)
+        return 404, "text/plain", "404 Not Found"
+
+
+def make_handler(box):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, Nagle would hold the body
+        # back until the client acknowledges the headers on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, content_type, body = box.handle(url.path, params)
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not box.rate:
+                self.wfile.write(body)
+                return
+            for start in range(0, len(body), RATE_CHUNK):
+                self.wfile.write(body[start:start + RATE_CHUNK])
+                self.wfile.flush()
+                time.sleep(min(RATE_CHUNK, len(body) - start) / box.rate)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, box, ssl_context=None, tls_delay=0.0):
+        super().__init__(address, make_handler(box))
+        self.box = box
+        self.ssl_context = ssl_context
+        self.tls_delay = tls_delay
+
+    def get_request(self):
+        sock, address = super().get_request()
+        if self.ssl_context is not None:
+            # handshakes run one after the other, like on the slow CPU of a box
+            time.sleep(self.tls_delay)
+            sock = self.ssl_context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+
+def self_signed_context(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=fritz.box", "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+def start_boxes(count=1, port=0, host="127.0.0.1", tls=False, tls_delay=0.0, **box_options):
+    """Start ``count`` simulated boxes in background threads, return their servers."""
+    ssl_context = None
+    if tls:
+        ssl_context = self_signed_context(tempfile.mkdtemp(prefix="fritz-simulator-"))
+    servers = []
+    for index in range(count):
+        box = SimulatedBox(seed=box_options.pop("seed", 0) + index, **box_options)
+        server = SimulatorServer((host, port + index if port else 0), box, ssl_context, tls_delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080, help="port of the first box")
+    parser.add_argument("--boxes", type=int, default=1)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--username", default="smarthome")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--challenge", choices=["md5", "pbkdf2"], default="pbkdf2")
+    parser.add_argument("--sid-ttl", type=int, default=1200, help="SID inactivity timeout in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency up to ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    parser.add_argument("--tls-delay", type=float, default=0.0, help="delay before each TLS handshake in ms")
+    parser.add_argument("--rate", type=float, default=0.0, help="transfer rate of responses in kB/s, 0 for no limit")
+    args = parser.parse_args()
+
+    servers = start_boxes(
+        args.boxes, args.port, args.host, args.tls, args.tls_delay / 1000,
+        devices=args.devices, seed=args.seed, username=args.username, password=args.password,
+        challenge=args.challenge, sid_ttl=args.sid_ttl, latency=args.latency / 1000,
+        jitter=args.jitter / 1000, error_rate=args.error_rate, rate=args.rate * 1000,
+    )
+    scheme = "https" if args.tls else "http"
+    for server in servers:
+        print(f"box on {scheme}://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            print(f"{server.server_address[1]}: {server.box.counters}")
+
+
+if __name__ == "__main__":
+    main()
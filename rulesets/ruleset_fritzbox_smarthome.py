@@ -10,6 +10,8 @@ from cmk.rulesets.v1.rule_specs import CheckParameters, HostAndItemCondition, To
 from cmk.rulesets.v1 import Title
 from cmk.rulesets.v1.form_specs import SingleChoice, SingleChoiceElement, DefaultValue
 from cmk.rulesets.v1.form_specs import BooleanChoice, DefaultValue
+from cmk.rulesets.v1.form_specs import LevelDirection, SimpleLevels, TimeMagnitude, TimeSpan
+from cmk.rulesets.v1 import Help
 
 
 
@@ -31,10 +33,25 @@ def _parameter_form():
                 required=True,
             ),
 
+            # active alarms (smoke detectors, HAN-FUN contacts)
+            'alarm': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Active alarms"),
+                    elements=[
+                        SingleChoiceElement("ok",   Title("show as OK")),
+                        SingleChoiceElement("warn", Title("show as WARN")),
+                        SingleChoiceElement("crit", Title("show as CRIT")),
+                    ],
+                    prefill=DefaultValue("crit"),
+                ),
+                required=False,
+            ),
+
             # show HANFUNUnit (default: off)
+            # kept for existing rules, HAN-FUN units are selected by the special agent
             'showHFunit': DictElement(
                 parameter_form=BooleanChoice(
-                    title=Title("show HANFUNUnit entries"),
+                    title=Title("show HANFUNUnit entries (no effect, see the special agent rule)"),
                     prefill=DefaultValue(False),
                 ),
                 required=True,
@@ -199,6 +216,68 @@ def _parameter_form():
                 ),
                 required = True,
             ),
+
+            # trends from the local history of the check
+            'trends': DictElement(
+                parameter_form = Dictionary(
+                    title     = Title("Trends"),
+                    help_text = Help(
+                        "The check keeps the temperature, power and battery readings of the last "
+                        "hours resp. days per device in a local file and checks their trends. "
+                        "A trend that is not configured here is not checked."
+                    ),
+                    elements = {
+                        'battery_days': DictElement(
+                            parameter_form = SimpleLevels(
+                                title                = Title("Battery empty in (days)"),
+                                help_text            = Help(
+                                    "Forecast from the battery level of the last 30 days, once it "
+                                    "dropped over at least one day."
+                                ),
+                                level_direction      = LevelDirection.LOWER,
+                                form_spec_template   = Float(unit_symbol="days"),
+                                prefill_fixed_levels = DefaultValue((30.0, 7.0)),
+                            ),
+                            required = False,
+                        ),
+                        'temperature_fall': DictElement(
+                            parameter_form = SimpleLevels(
+                                title                = Title("Temperature falling faster than"),
+                                help_text            = Help(
+                                    "A fast drop of the temperature, e.g. an open window the "
+                                    "thermostat did not detect."
+                                ),
+                                level_direction      = LevelDirection.UPPER,
+                                form_spec_template   = Float(unit_symbol="K/h"),
+                                prefill_fixed_levels = DefaultValue((2.0, 4.0)),
+                            ),
+                            required = False,
+                        ),
+                        'temperature_window': DictElement(
+                            parameter_form = TimeSpan(
+                                title                = Title("Time range of the temperature trend"),
+                                displayed_magnitudes = [TimeMagnitude.MINUTE],
+                                prefill              = DefaultValue(1800.0),
+                            ),
+                            required = False,
+                        ),
+                        'power_deviation': DictElement(
+                            parameter_form = SimpleLevels(
+                                title                = Title("Power deviation from the average"),
+                                help_text            = Help(
+                                    "In standard deviations of the last 1440 power readings (24 hours "
+                                    "at the default check interval), taken as at least 1 W."
+                                ),
+                                level_direction      = LevelDirection.UPPER,
+                                form_spec_template   = Float(unit_symbol="σ"),
+                                prefill_fixed_levels = DefaultValue((4.0, 6.0)),
+                            ),
+                            required = False,
+                        ),
+                    }
+                ),
+                required = False,
+            ),
         }
     )
 
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+from cmk.rulesets.v1 import Title, Help
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue,
+    Dictionary,
+    DictElement,
+    LevelDirection,
+    SimpleLevels,
+    SingleChoice,
+    SingleChoiceElement,
+    TimeMagnitude,
+    TimeSpan,
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, Topic
+
+
+def _parameter_form():
+    return Dictionary(
+        title      = Title("Fritz!Box Smarthome agent runtime"),
+        elements   = {
+            'runtime': DictElement(
+                parameter_form = SimpleLevels(
+                    title                = Title("Levels on the total runtime"),
+                    help_text            = Help(
+                        "Warn before the agent runs into its fetch timeout; the read timeout "
+                        "of the special agent defaults to 30 seconds."
+                    ),
+                    level_direction      = LevelDirection.UPPER,
+                    form_spec_template   = TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.SECOND, TimeMagnitude.MILLISECOND],
+                    ),
+                    prefill_fixed_levels = DefaultValue((15.0, 25.0)),
+                ),
+                required = True,
+            ),
+            'partial': DictElement(
+                parameter_form = SingleChoice(
+                    title     = Title("Partial runs"),
+                    help_text = Help(
+                        "State if the agent ran out of its time budget or could not refresh some "
+                        "devices between two full fetches, and sent only the devices it had read. "
+                        "The services of the other devices keep their last state."
+                    ),
+                    elements  = [
+                        SingleChoiceElement("ok",   Title("show as OK")),
+                        SingleChoiceElement("warn", Title("show as WARN")),
+                        SingleChoiceElement("crit", Title("show as CRIT")),
+                    ],
+                    prefill   = DefaultValue("warn"),
+                ),
+                required = False,
+            ),
+        }
+    )
+
+
+# define and register ruleset block
+rule_spec_fritzbox_smarthome_agent = CheckParameters(
+    name            = "fritzbox_smarthome_agent",
+    title           = Title("Fritz!Box Smarthome agent runtime"),
+    topic           = Topic.GENERAL,
+    parameter_form  = _parameter_form,
+    condition       = HostCondition(),
+)
@@ -7,7 +7,13 @@ from cmk.rulesets.v1.form_specs import (
     SingleChoice,
     SingleChoiceElement,
     BooleanChoice,
+    CascadingSingleChoice,
+    CascadingSingleChoiceElement,
     DefaultValue,
+    Float,
+    List,
+    MatchingScope,
+    RegularExpression,
     migrate_to_password
 )
 from cmk.rulesets.v1.rule_specs import SpecialAgent, Topic, Help, Title
@@ -62,6 +68,302 @@ def _formspec():
                     prefill=DefaultValue(False),
                 ),
             ),
+            "transport": DictElement(
+                required=False,
+                parameter_form=SingleChoice(
+                    title=Title("HTTP client"),
+                    help_text=Help(
+                        "The built-in client of Python starts faster. The requests library honours "
+                        "proxy settings (HTTPS_PROXY, NO_PROXY) and REQUESTS_CA_BUNDLE from the "
+                        "environment."
+                    ),
+                    elements=[
+                        SingleChoiceElement("stdlib", Title("Python standard library")),
+                        SingleChoiceElement("requests", Title("requests")),
+                    ],
+                    prefill=DefaultValue("stdlib"),
+                ),
+            ),
+            "timeouts": DictElement(
+                required=False,
+                parameter_form=Dictionary(
+                    title=Title("Timeouts and retries"),
+                    elements={
+                        "connect": DictElement(
+                            required=True,
+                            parameter_form=Float(
+                                title=Title("Connect timeout (seconds)"),
+                                prefill=DefaultValue(5.0),
+                            ),
+                        ),
+                        "read": DictElement(
+                            required=True,
+                            parameter_form=Float(
+                                title=Title("Read timeout (seconds)"),
+                                prefill=DefaultValue(30.0),
+                            ),
+                        ),
+                        "retries": DictElement(
+                            required=True,
+                            parameter_form=Integer(
+                                title=Title("Retries after connection errors, timeouts and server errors"),
+                                prefill=DefaultValue(2),
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            "deadline": DictElement(
+                required=False,
+                parameter_form=Float(
+                    title=Title("Time budget per Fritz!Box and run (seconds)"),
+                    help_text=Help(
+                        "A login may use up to half of it, the timeouts of all requests are cut to "
+                        "what is left. If the budget runs out, the devices read so far are sent and "
+                        "the services of the others keep their last state; the 'Smarthome agent' "
+                        "service shows the run as partial. Needs the compact section format."
+                    ),
+                    prefill=DefaultValue(50.0),
+                ),
+            ),
+            "boxes": DictElement(
+                required=False,
+                parameter_form=List(
+                    title=Title("Additional Fritz!Boxes"),
+                    help_text=Help(
+                        "Poll further Fritz!Boxes with the same credentials in the same agent run. "
+                        "The data of each box is sent to its own piggyback host."
+                    ),
+                    element_template=Dictionary(
+                        elements={
+                            "host": DictElement(
+                                required=True,
+                                parameter_form=String(title=Title("Host name or IP address")),
+                            ),
+                            "port": DictElement(
+                                required=False,
+                                parameter_form=Integer(title=Title("Port")),
+                            ),
+                            "piggyback": DictElement(
+                                required=False,
+                                parameter_form=String(
+                                    title=Title("Piggyback host"),
+                                    help_text=Help("Defaults to the host name or IP address."),
+                                ),
+                            ),
+                        },
+                    ),
+                ),
+            ),
+            "boxes_file": DictElement(
+                required=False,
+                parameter_form=String(
+                    title=Title("File with additional Fritz!Boxes"),
+                    help_text=Help(
+                        "Path to a JSON file with a list of boxes, each an object with 'host' and "
+                        "optionally 'port', 'protocol', 'username', 'password', 'ignore_ssl' and 'piggyback'."
+                    ),
+                ),
+            ),
+            "max_workers": DictElement(
+                required=False,
+                parameter_form=Integer(
+                    title=Title("Maximum number of boxes polled in parallel"),
+                    prefill=DefaultValue(8),
+                ),
+            ),
+            "box_workers": DictElement(
+                required=False,
+                parameter_form=Integer(
+                    title=Title("Maximum number of parallel requests to one box"),
+                    help_text=Help(
+                        "Connections the per-device queries of the device list refresh and the device "
+                        "history use per Fritz!Box. Keep it small, the boxes answer slowly under load."
+                    ),
+                    prefill=DefaultValue(4),
+                ),
+            ),
+            "filter": DictElement(
+                required=False,
+                parameter_form=Dictionary(
+                    title=Title("Device selection"),
+                    help_text=Help(
+                        "Select the devices the agent sends. A device is sent if it matches any of the "
+                        "include conditions (or none is set) and none of the exclude conditions. "
+                        "AINs are compared without blanks, masks match if any of their "
+                        "functionbitmask bits is set."
+                    ),
+                    elements={
+                        "include_ains": DictElement(
+                            required=False,
+                            parameter_form=List(
+                                title=Title("Include AINs"),
+                                element_template=String(),
+                            ),
+                        ),
+                        "include_mask": DictElement(
+                            required=False,
+                            parameter_form=Integer(title=Title("Include functionbitmask bits")),
+                        ),
+                        "include_name": DictElement(
+                            required=False,
+                            parameter_form=RegularExpression(
+                                title=Title("Include names matching"),
+                                predefined_help_text=MatchingScope.INFIX,
+                            ),
+                        ),
+                        "exclude_ains": DictElement(
+                            required=False,
+                            parameter_form=List(
+                                title=Title("Exclude AINs"),
+                                element_template=String(),
+                            ),
+                        ),
+                        "exclude_mask": DictElement(
+                            required=False,
+                            parameter_form=Integer(title=Title("Exclude functionbitmask bits")),
+                        ),
+                        "exclude_name": DictElement(
+                            required=False,
+                            parameter_form=RegularExpression(
+                                title=Title("Exclude names matching"),
+                                predefined_help_text=MatchingScope.INFIX,
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            "hanfun_units": DictElement(
+                required=False,
+                parameter_form=BooleanChoice(
+                    title=Title("Send HAN-FUN units"),
+                    help_text=Help(
+                        "HAN-FUN units (e.g. the contact of a HAN-FUN door sensor) are not sent by default, "
+                        "lights and blinds are always sent."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "fields": DictElement(
+                required=False,
+                parameter_form=SingleChoice(
+                    title=Title("Device data fields"),
+                    help_text=Help(
+                        "Sending only the fields the check plugin uses shrinks the agent output "
+                        "and speeds up parsing for large installations."
+                    ),
+                    elements=[
+                        SingleChoiceElement("all", Title("All fields")),
+                        SingleChoiceElement("plugin", Title("Only fields used by the check plugin")),
+                    ],
+                    prefill=DefaultValue("all"),
+                ),
+            ),
+            "polling": DictElement(
+                required=False,
+                parameter_form=CascadingSingleChoice(
+                    title=Title("Reduce the work per run"),
+                    help_text=Help("Only one of these can be used, both change how the device list is fetched."),
+                    elements=[
+                        CascadingSingleChoiceElement(
+                            name="metadata_ttl",
+                            title=Title("Refresh interval of the full device list"),
+                            parameter_form=Integer(
+                                title=Title("Seconds"),
+                                help_text=Help(
+                                    "Fetch the full device list only in this interval and query the "
+                                    "selected devices one by one in between. Pays off when only a few of "
+                                    "the devices of the box are monitored."
+                                ),
+                                prefill=DefaultValue(3600),
+                            ),
+                        ),
+                        CascadingSingleChoiceElement(
+                            name="unchanged_max_age",
+                            title=Title("Re-send unchanged device data"),
+                            parameter_form=Integer(
+                                title=Title("Seconds"),
+                                help_text=Help(
+                                    "While the device list of the Fritz!Box is byte for byte unchanged, send "
+                                    "the section of the last run again instead of building it, marked as cached "
+                                    "since then. After this many seconds the section is built anew in any case. "
+                                    "The device list is read completely before parsing."
+                                ),
+                                prefill=DefaultValue(600),
+                            ),
+                        ),
+                    ],
+                    prefill=DefaultValue("metadata_ttl"),
+                ),
+            ),
+            "stats": DictElement(
+                required=False,
+                parameter_form=BooleanChoice(
+                    title=Title("Fetch device history"),
+                    help_text=Help(
+                        "Fetch the temperature, humidity, power, voltage and energy history the Fritz!Box "
+                        "records per device and report min, max, average and trend of the samples of the "
+                        "last hour as services on the Fritz!Box host."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "spool": DictElement(
+                required=False,
+                parameter_form=Dictionary(
+                    title=Title("Read data from the resident collector"),
+                    help_text=Help(
+                        "Do not contact the Fritz!Boxes, only read what the collector "
+                        "(agent_fritzbox_smarthome --collector) last wrote to its spool directory. "
+                        "The collector has to be started separately with the same box options."
+                    ),
+                    elements={
+                        "max_age": DictElement(
+                            required=True,
+                            parameter_form=Integer(
+                                title=Title("Maximum age of the spooled data (seconds)"),
+                                prefill=DefaultValue(300),
+                            ),
+                        ),
+                        "spool_dir": DictElement(
+                            required=False,
+                            parameter_form=String(
+                                title=Title("Spool directory"),
+                                help_text=Help(
+                                    "The --spool-dir the collector was started with. Defaults to "
+                                    "~/tmp/check_mk/special_agents/agent_fritzbox_smarthome/spool."
+                                ),
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            "piggyback": DictElement(
+                required=False,
+                parameter_form=SingleChoice(
+                    title=Title("Piggyback hosts"),
+                    help_text=Help(
+                        "Send the devices to piggyback hosts instead of the Fritz!Box host, "
+                        "so Checkmk can schedule them independently."
+                    ),
+                    elements=[
+                        SingleChoiceElement("none", Title("All devices on the Fritz!Box host")),
+                        SingleChoiceElement("device", Title("One host per device")),
+                        SingleChoiceElement("group", Title("One host per Fritz!Box group")),
+                    ],
+                    prefill=DefaultValue("none"),
+                ),
+            ),
+            "piggyback_template": DictElement(
+                required=False,
+                parameter_form=String(
+                    title=Title("Name of the piggyback hosts"),
+                    help_text=Help(
+                        "Fields: {box}, {id}, {ain}, {name}, for group hosts also {group} and {group_id}. "
+                        "Defaults to {box}_{name} resp. {box}_{group}."
+                    ),
+                ),
+            ),
         },
     )
 
@@ -13,7 +13,70 @@ def _agent_arguments(params, host_config):
 
     if params.get("ignore_ssl", False):
         args.append("--ignore-ssl")
-    
+
+    if params.get("transport", "stdlib") != "stdlib":
+        args += ["--transport", params["transport"]]
+
+    if "timeouts" in params:
+        timeouts = params["timeouts"]
+        args += [
+            "--connect-timeout", str(timeouts["connect"]),
+            "--read-timeout", str(timeouts["read"]),
+            "--retries", str(timeouts["retries"]),
+        ]
+
+    if "deadline" in params:
+        args += ["--deadline", str(params["deadline"])]
+
+    for box in params.get("boxes", []):
+        spec = box["host"]
+        if "port" in box:
+            spec += f":{box['port']}"
+        if box.get("piggyback"):
+            spec += f"={box['piggyback']}"
+        args += ["--box", spec]
+
+    if params.get("boxes_file"):
+        args += ["--boxes-file", params["boxes_file"]]
+
+    if "max_workers" in params:
+        args += ["--max-workers", str(params["max_workers"])]
+
+    if "box_workers" in params:
+        args += ["--box-workers", str(params["box_workers"])]
+
+    device_filter = params.get("filter", {})
+    for ain in device_filter.get("include_ains", []):
+        args += ["--include-ain", ain]
+    for ain in device_filter.get("exclude_ains", []):
+        args += ["--exclude-ain", ain]
+    for option in ("include_mask", "exclude_mask", "include_name", "exclude_name"):
+        if option in device_filter:
+            args += ["--" + option.replace("_", "-"), str(device_filter[option])]
+
+    if params.get("hanfun_units", False):
+        args.append("--hanfun-units")
+
+    if params.get("fields", "all") != "all":
+        args += ["--fields", params["fields"]]
+
+    if "polling" in params:
+        mode, seconds = params["polling"]
+        args += ["--" + mode.replace("_", "-"), str(seconds)]
+
+    if params.get("stats", False):
+        args.append("--stats")
+
+    if "spool" in params:
+        args += ["--from-spool", "--spool-max-age", str(params["spool"]["max_age"])]
+        if params["spool"].get("spool_dir"):
+            args += ["--spool-dir", params["spool"]["spool_dir"]]
+
+    if params.get("piggyback", "none") != "none":
+        args += ["--piggyback", params["piggyback"]]
+        if params.get("piggyback_template"):
+            args += ["--piggyback-template", params["piggyback_template"]]
+
     yield SpecialAgentCommand(command_arguments=args)
 
 special_agent_fritzbox_smarthome = SpecialAgentConfig(